@@ -0,0 +1,162 @@
+# admission.py
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request
+
+from metrics import Counter
+
+# ===== допуск к рендеру: сколько одновременно, сколько ждёт, сколько на клиента =====
+QR_ADMIT_CONCURRENCY = int(os.getenv("QR_ADMIT_CONCURRENCY", str(2 * (os.cpu_count() or 1))))   # 0 — без лимита
+QR_ADMIT_QUEUE = int(os.getenv("QR_ADMIT_QUEUE", "64"))                 # ждущих сверх лимита; дальше — 503 сразу
+QR_ADMIT_TIMEOUT = float(os.getenv("QR_ADMIT_TIMEOUT", "2"))            # сек в очереди до 503
+QR_ADMIT_RETRY_AFTER = int(os.getenv("QR_ADMIT_RETRY_AFTER", "1"))      # Retry-After при переполнении, сек
+QR_ADMIT_BATCH_SHARE = float(os.getenv("QR_ADMIT_BATCH_SHARE", "0.5"))   # доля слотов под строки ZIP-выгрузок
+QR_CLIENT_RATE = float(os.getenv("QR_CLIENT_RATE", "0"))                # рендеров/с на клиента; 0 — выключено
+QR_CLIENT_BURST = int(os.getenv("QR_CLIENT_BURST", "20"))
+QR_CLIENT_TRACKED = 10000                                               # сколько клиентов помним (LRU)
+
+REJECTED = Counter("qr_admission_rejected_total", "Рендеры, отклонённые допуском (503)", ("reason",))
+
+
+class Overloaded(HTTPException):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(503, f"Сервис перегружен ({reason}), повторите позже",
+                         headers={"Retry-After": str(retry_after)})
+        self.reason = reason
+
+
+class Admission:
+    """
+    Лимит одновременных рендеров с ограниченной очередью и token bucket на клиента.
+    Только счётчики и futures текущего цикла — не привязан к event loop (TestClient, бенчмарки).
+    Слот при освобождении передаётся первому ждущему напрямую: новые запросы не обгоняют очередь.
+    Выгрузки (run_batch) ждут отдельно и после обычных запросов, занимая не больше batch_share слотов.
+    """
+
+    def __init__(self, concurrency: int, queue: int, timeout: float, retry_after: int, rate: float, burst: int,
+                 batch_share: float = QR_ADMIT_BATCH_SHARE):
+        self.concurrency, self.queue, self.timeout, self.retry_after = concurrency, queue, timeout, retry_after
+        self.rate, self.burst, self.batch_share = rate, burst, batch_share
+        self.active = 0
+        self.batch_active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._batch_waiters: "deque[asyncio.Future]" = deque()
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()     # клиент -> [токены, время]
+
+    def _reject(self, reason: str, retry_after: int = None):
+        REJECTED.inc(reason)
+        raise Overloaded(reason, retry_after or self.retry_after)
+
+    def _take_token(self, client: str) -> None:
+        now = time.monotonic()
+        bucket = self._buckets.pop(client, None) or [float(self.burst), now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self._buckets[client] = bucket
+        if len(self._buckets) > QR_CLIENT_TRACKED:
+            self._buckets.popitem(last=False)
+        if bucket[0] < 1:
+            self._reject("client_rate", math.ceil((1 - bucket[0]) / self.rate))
+        bucket[0] -= 1
+
+    async def _acquire(self) -> None:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue:
+            self._reject("queue_full")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, self.timeout)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                self._release()             # слот уже передан нам, но мы уходим — отдаём дальше
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+
+    def _batch_limit(self) -> int:
+        return max(1, int(self.concurrency * self.batch_share))
+
+    def _release(self, batch: bool = False) -> None:
+        if batch:
+            self.batch_active -= 1
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        while self._batch_waiters and self.batch_active < self._batch_limit():
+            fut = self._batch_waiters.popleft()
+            if not fut.done():
+                self.batch_active += 1
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    async def run(self, request: Request, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Рендер под лимитом; Overloaded (503 + Retry-After), если места нет."""
+        if self.rate > 0:
+            self._take_token(request.client.host if request.client else "-")
+        if self.concurrency <= 0:
+            return await render()
+        await self._acquire()
+        try:
+            return await render()
+        finally:
+            self._release()
+
+    async def run_batch(self, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        Рендер строки выгрузки: ZIP уже отдаётся, поэтому без 503 и таймаута — ждём слот.
+        Обычные запросы в очереди идут первыми, выгрузки вместе держат не больше batch_share слотов.
+        """
+        if self.concurrency <= 0:
+            return await render()
+        if self.active < self.concurrency and not self._waiters and self.batch_active < self._batch_limit():
+            self.active += 1
+            self.batch_active += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self._batch_waiters.append(fut)
+            try:
+                await fut
+            except BaseException:
+                if fut.done() and not fut.cancelled():
+                    self._release(batch=True)
+                else:
+                    try:
+                        self._batch_waiters.remove(fut)
+                    except ValueError:
+                        pass
+                raise
+        try:
+            return await render()
+        finally:
+            self._release(batch=True)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "batch_active": self.batch_active,
+            "batch_waiting": len(self._batch_waiters),
+            "queue": self.queue,
+            "clients": len(self._buckets),
+        }
+
+
+ADMISSION = Admission(QR_ADMIT_CONCURRENCY, QR_ADMIT_QUEUE, QR_ADMIT_TIMEOUT, QR_ADMIT_RETRY_AFTER,
+                      QR_CLIENT_RATE, QR_CLIENT_BURST)
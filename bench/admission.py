@@ -0,0 +1,108 @@
+"""
+Перегрузка рендер-эндпоинтов: задержки с допуском (admission.py) и без него.
+
+    python -m bench.admission                    # поток в 2x сверх пропускной способности, 5 с
+    python -m bench.admission --overload 4 --seconds 10 --concurrency 2 --queue 16
+
+Открытая нагрузка через ASGI в процессе: запросы приходят с постоянной частотой, каждый — уникальные
+данные (промах кэша, настоящий рендер). Параллельно раз в 50 мс опрашивается /healthz.
+Без лимита p99 растёт вместе с длиной прогона; с лимитом принятые запросы укладываются в таймаут очереди,
+лишние получают 503 сразу.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+
+def _pct(samples, p):
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+
+async def _capacity(app, call, size: int, seconds: float = 2.0) -> float:
+    # замкнутый цикл в одного клиента на рендер-воркер — сколько рендеров/с держит процесс
+    n, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        await call(app, "GET", "/qr", {"data": f"capacity-{n}", "size": size})
+        n += 1
+    return n / (time.perf_counter() - t0)
+
+
+async def _load(app, call, rate: float, seconds: float, size: int, tag: str) -> dict:
+    latencies = {}
+    health = []
+    tasks = []
+    stop = time.perf_counter() + seconds
+
+    async def one(i, t0):
+        # от планового момента прихода: иначе отставание генератора спрятало бы очередь
+        status, _, _ = await call(app, "GET", "/qr", {"data": f"{tag}-{i}", "size": size})
+        latencies.setdefault(status, []).append(time.perf_counter() - t0)
+
+    async def probe():
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            await call(app, "GET", "/healthz")
+            health.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.05)
+
+    prober = asyncio.ensure_future(probe())
+    i, t_start = 0, time.perf_counter()
+    while time.perf_counter() < stop:
+        due = int((time.perf_counter() - t_start) * rate) + 1
+        while i < due:                           # отстали — отправляем всё, что уже должно было прийти
+            tasks.append(asyncio.ensure_future(one(i, t_start + i / rate)))
+            i += 1
+        await asyncio.sleep(max(0.0, t_start + i / rate - time.perf_counter()))
+    await asyncio.gather(*tasks, prober)
+    return {"sent": i, "latencies": latencies, "health": health}
+
+
+def _report(name: str, res: dict) -> None:
+    ok = res["latencies"].get(200, [])
+    shed = res["latencies"].get(503, [])
+    print(f"{name:<10} {res['sent']:>6} {len(ok):>6} {len(shed):>6} | "
+          f"{_pct(ok, 0.5):>8.0f} {_pct(ok, 0.99):>8.0f} {_pct(shed, 0.99):>8.1f} | "
+          f"{_pct(res['health'], 0.99):>8.1f}")
+
+
+async def _main(args) -> None:
+    import main
+    from admission import ADMISSION
+    from bench.asgi import call
+    from render_pool import RENDER_POOL
+
+    RENDER_POOL.start()
+    try:
+        capacity = await _capacity(main.app, call, args.size)
+        rate = capacity * args.overload
+        print(f"пропускная способность ~{capacity:.0f} рендеров/с, нагрузка {rate:.0f} запросов/с, {args.seconds} с")
+        print(f"{'mode':<10} {'sent':>6} {'200':>6} {'503':>6} | {'p50 ms':>8} {'p99 ms':>8} {'503 p99':>8} | "
+              f"{'healthz p99':>8}")
+        ADMISSION.concurrency = 0
+        _report("no limit", await _load(main.app, call, rate, args.seconds, args.size, "off"))
+        ADMISSION.concurrency, ADMISSION.queue, ADMISSION.timeout = args.concurrency, args.queue, args.timeout
+        _report("admission", await _load(main.app, call, rate, args.seconds, args.size, "on"))
+    finally:
+        RENDER_POOL.shutdown()
+
+
+def main() -> int:
+    from admission import QR_ADMIT_CONCURRENCY, QR_ADMIT_QUEUE, QR_ADMIT_TIMEOUT
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--overload", type=float, default=2.0, help="во сколько раз поток больше пропускной способности")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--size", type=int, default=512)
+    ap.add_argument("--concurrency", type=int, default=QR_ADMIT_CONCURRENCY or 2)
+    ap.add_argument("--queue", type=int, default=QR_ADMIT_QUEUE)
+    ap.add_argument("--timeout", type=float, default=QR_ADMIT_TIMEOUT)
+    args = ap.parse_args()
+    asyncio.run(_main(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
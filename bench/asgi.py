@@ -0,0 +1,45 @@
+"""Минимальный in-process ASGI-клиент: без сети и без httpx, только чтобы гонять приложение в бенчмарках."""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+
+async def call(app, method: str, path: str, query: Optional[dict] = None,
+               headers: Optional[Dict[str, str]] = None, body: bytes = b"") -> Tuple[int, Dict[str, str], bytes]:
+    raw_headers: List[Tuple[bytes, bytes]] = [(b"host", b"bench")]
+    for k, v in (headers or {}).items():
+        raw_headers.append((k.lower().encode("latin-1"), v.encode("latin-1")))
+    if body:
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": urlencode(query or {}).encode(), "headers": raw_headers,
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80), "root_path": "",
+    }
+    sent = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # как у настоящего сервера: клиент на связи, пока ответ не отправлен (иначе is_disconnected() -> 499)
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    status, resp_headers, chunks = 0, {}, []
+
+    async def send(message):
+        nonlocal status, resp_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            resp_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return status, resp_headers, b"".join(chunks)
@@ -0,0 +1,83 @@
+"""
+Запросы в секунду на горячих GET: маршруты FastAPI против сырого ASGI (QR_FAST_PATH=1).
+
+    python -m bench.fast_path                 # оба режима, по дочернему процессу на каждый
+    python -m bench.fast_path --seconds 5
+
+Режим включается переменной окружения при импорте main, поэтому каждый меряется в своём процессе.
+Картинки в кэше — меряется именно накладная часть запроса. Ответы (статус, заголовки, тело)
+в обоих режимах сверяются; расхождение — код выхода 1.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+VCARD_Q = {"fn": "Иванов Иван Иванович", "org": "ЗН Цифра", "title": "Инженер", "dept": "Отдел",
+           "email": "ivan@company.ru", "mobile": "+79991234567", "work_short": "002-8042"}
+QR_Q = {"data": "https://example.com/p?q=abcdefghijklmnopqrstuvwxyz0123456789", "size": 512}
+
+
+async def _child(seconds: float) -> dict:
+    import main
+    from bench.asgi import call
+
+    cases = {
+        "qr/png": ("GET", "/qr", QR_Q, {}),
+        "qr/svg": ("GET", "/qr", {**QR_Q, "format": "svg"}, {}),
+        "qr/head": ("HEAD", "/qr", QR_Q, {}),
+        "vcard/png": ("GET", "/qr/vcard", VCARD_Q, {}),
+        "qr/invalid": ("GET", "/qr", {**QR_Q, "size": 9999}, {}),        # уходит в FastAPI в обоих режимах
+    }
+    _, headers, _ = await call(main.app, "GET", "/qr", QR_Q)
+    cases["qr/304"] = ("GET", "/qr", QR_Q, {"if-none-match": f'"{headers["etag"]}"'})
+
+    results = {}
+    for name, (method, path, query, hdrs) in cases.items():
+        hdrs = {"origin": "https://portal.example", **hdrs}                         # CORS тоже сверяем
+        status, resp_headers, body = await call(main.app, method, path, query, hdrs)   # прогрев кэша
+        resp_headers.pop("last-modified", None)     # время старта своего процесса — в режимах разное
+        digest = hashlib.sha256(json.dumps([status, sorted(resp_headers.items())]).encode() + body).hexdigest()
+        n, t0 = 0, time.perf_counter()
+        while time.perf_counter() - t0 < seconds:
+            for _ in range(50):
+                await call(main.app, method, path, query, hdrs)
+            n += 50
+        results[name] = {"rps": n / (time.perf_counter() - t0), "status": status, "digest": digest}
+    return results
+
+
+def _run_mode(enabled: bool, seconds: float) -> dict:
+    env = {**os.environ, "QR_FAST_PATH": "1" if enabled else "0"}
+    out = subprocess.run([sys.executable, "-m", "bench.fast_path", "--child", "--seconds", str(seconds)],
+                         env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=2.0, help="время замера на кейс")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.seconds))))
+        return 0
+
+    base, fast = _run_mode(False, args.seconds), _run_mode(True, args.seconds)
+    diffs = 0
+    print(f"{'case':<12} {'status':>6} | {'fastapi rps':>11} {'fast rps':>9} {'x':>5}  same")
+    for name, b in base.items():
+        f = fast[name]
+        same = b["digest"] == f["digest"]
+        diffs += not same
+        print(f"{name:<12} {b['status']:>6} | {b['rps']:>11.0f} {f['rps']:>9.0f} {f['rps'] / b['rps']:>5.2f}"
+              f"  {'ok' if same else 'DIFF'}")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""
+Нагрузочный тест целиком: смесь сценариев, пропускная способность, перцентили, ошибки и пиковый RSS.
+
+    python -m bench.load                                           # в процессе, смесь по умолчанию, 10..40 клиентов
+    python -m bench.load --rate 50 100 200 --slo-ms 300            # открытая нагрузка, запросов/с по ступеням
+    python -m bench.load --url http://127.0.0.1:8000 --server-pid $(pgrep -of "uvicorn main:app")
+    python -m bench.load --mix qr_png=1,vcard_ios=1 compose=1 --revalidate 0.5 --sizes 256 1024 --out load.json
+
+Сценарии (вес через --mix имя=вес, по одному аргументу на смесь — каждая смесь гоняется отдельно):
+qr_png, qr_svg — GET /qr с размерами из --sizes; compose — POST /qr/compose по типам FORM_SPEC, png/svg;
+vcard_ios, vcard_android — GET /qr/vcard; post_long — POST /qr с --long-chars символами.
+--distinct задаёт, из скольких вариантов данных выбирается каждый запрос (меньше — больше попаданий в кэш);
+--revalidate — доля повторов уже полученных ответов с If-None-Match (ожидается 304).
+
+Цель — приложение в этом процессе (генератор делит с ним CPU — для сравнений) или сервер по --url
+(честная ёмкость пода: uvicorn с теми же воркерами и QR_*, что в проде). Задержка в открытой нагрузке считается
+от планового момента запроса, так что отставание генератора не прячет очередь. Ошибки — статус >= 400
+(в том числе 503 от допуска) и обрывы соединения. RSS — сумма процесса-цели и его детей (пул рендера) по /proc.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MIX = "qr_png=4,qr_svg=1,compose=2,vcard_ios=2,vcard_android=1,post_long=1"
+COMPOSE_VARY = {"url": "url", "text": "text", "tel": "number", "email": "email", "sms": "body",
+                "wifi": "ssid", "vcard": "note"}     # какое поле менять, чтобы получить другой вариант данных
+
+
+# ===== сценарии: (method, path, query, headers, body) =====
+def _scenarios(args):
+    from bench.masks import PEOPLE
+    from bench.svg import SAMPLES
+
+    def qr(fmt):
+        def make(rng, v):
+            return "GET", "/qr", {"data": f"https://example.com/item/{v}", "format": fmt,
+                                  "size": rng.choice(args.sizes)}, {}, b""
+        return make
+
+    def compose(rng, v):
+        kind = rng.choice(list(SAMPLES))
+        fields = dict(SAMPLES[kind])
+        field = COMPOSE_VARY[kind]
+        fields[field] = f"{fields[field]}{v}"
+        body = {"type": kind, "fields": fields, "format": rng.choice(args.formats), "size": rng.choice(args.sizes)}
+        return "POST", "/qr/compose", None, {"content-type": "application/json"}, json.dumps(body).encode()
+
+    def vcard(os_profile):
+        def make(rng, v):
+            fn, org, title, dept, email, mobile, work_short = PEOPLE[v % len(PEOPLE)]
+            return "GET", "/qr/vcard", {"fn": f"{fn} {v}", "org": org, "title": title, "dept": dept,
+                                        "email": email, "mobile": mobile, "work_short": work_short,
+                                        "os": os_profile, "format": rng.choice(args.formats)}, {}, b""
+        return make
+
+    def post_long(rng, v):
+        text = (f"{v}:" + "Long text for POST /qr that does not fit a comfortable GET URL. " * 100)[:args.long_chars]
+        return "POST", "/qr", None, {"content-type": "application/json"}, json.dumps({"data": text}).encode()
+
+    return {"qr_png": qr("png"), "qr_svg": qr("svg"), "compose": compose,
+            "vcard_ios": vcard("ios"), "vcard_android": vcard("android"), "post_long": post_long}
+
+
+def _parse_mix(text: str, scenarios) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in scenarios:
+            raise SystemExit(f"нет сценария {name!r}; есть: {', '.join(scenarios)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ===== транспорт =====
+class InProcess:
+    def __init__(self, app):
+        from bench.asgi import call
+        self.app, self._call = app, call
+
+    async def send(self, method, path, query, headers, body) -> Tuple[int, Dict[str, str]]:
+        status, resp_headers, _ = await self._call(self.app, method, path, query, headers, body)
+        return status, resp_headers
+
+    async def close(self):
+        pass
+
+
+class Http:
+    """HTTP/1.1 поверх asyncio с keep-alive: без сторонних клиентов, только Content-Length и chunked."""
+
+    def __init__(self, url: str):
+        u = urlsplit(url)
+        self.host, self.port = u.hostname, u.port or 80
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def send(self, method, path, query, headers, body) -> Tuple[int, Dict[str, str]]:
+        conn = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+        reader, writer = conn
+        try:
+            target = f"{path}?{urlencode(query)}" if query else path
+            lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                     f"Content-Length: {len(body)}"] + [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            status = int(head[0].split(" ", 2)[1])
+            resp_headers = {}
+            for line in head[1:]:
+                if line:
+                    k, _, v = line.partition(":")
+                    resp_headers[k.strip().lower()] = v.strip()
+            if resp_headers.get("transfer-encoding") == "chunked":
+                while True:
+                    n = int((await reader.readline()).split(b";")[0], 16)
+                    await reader.readexactly(n + 2)
+                    if n == 0:
+                        break
+            elif method != "HEAD":
+                await reader.readexactly(int(resp_headers.get("content-length", 0)))
+        except BaseException:
+            writer.close()
+            raise
+        if resp_headers.get("connection") == "close":
+            writer.close()
+        else:
+            self._idle.append(conn)
+        return status, resp_headers
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+# ===== пиковый RSS =====
+def _children(pid: int) -> List[int]:
+    out = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                out.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return out
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            if p == pid:
+                return None           # нет /proc (Windows, macOS) или чужой процесс
+        stack.extend(_children(p))
+    return total
+
+
+async def _rss_peak(pid: int, stop: asyncio.Event) -> Optional[int]:
+    peak = None
+    while not stop.is_set():
+        rss = _rss_bytes(pid)
+        if rss is not None:
+            peak = max(peak or 0, rss)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+    return peak
+
+
+# ===== прогон одной конфигурации =====
+async def _run(transport, scenarios, mix, args, *, rate: float = 0, concurrency: int = 0, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    known: List[tuple] = []                   # (запрос, etag) для повторов с If-None-Match
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    deadline = time.perf_counter() + args.seconds
+
+    def next_request():
+        if known and rng.random() < args.revalidate:
+            (method, path, query, headers, body), etag = rng.choice(known)
+            return method, path, query, {**headers, "if-none-match": f'"{etag}"'}, body
+        return scenarios[rng.choices(names, weights)[0]](rng, rng.randrange(args.distinct))
+
+    async def one(req, t0):
+        try:
+            status, headers = await transport.send(*req)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, headers = 0, {}
+        latencies.append(time.perf_counter() - t0)
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200 and "etag" in headers and len(known) < 10000:
+            known.append((req, headers["etag"]))
+
+    stop = asyncio.Event()
+    sampler = asyncio.ensure_future(_rss_peak(args.pid, stop))
+    t_start = time.perf_counter()
+    if rate:
+        tasks, i = [], 0
+        while time.perf_counter() < deadline:
+            due = int((time.perf_counter() - t_start) * rate) + 1
+            while i < due:
+                tasks.append(asyncio.ensure_future(one(next_request(), t_start + i / rate)))
+                i += 1
+            await asyncio.sleep(max(0.0, t_start + i / rate - time.perf_counter()))
+        await asyncio.gather(*tasks)
+    else:
+        async def client():
+            while time.perf_counter() < deadline:
+                await one(next_request(), time.perf_counter())
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t_start
+    stop.set()
+    peak = await sampler
+
+    latencies.sort()
+    n = len(latencies)
+    pct = lambda p: round(latencies[min(n - 1, int(p * n))] * 1000, 2) if n else None
+    errors = sum(v for k, v in statuses.items() if k == 0 or k >= 400)
+    return {
+        "requests": n,
+        "rps": round(n / elapsed, 1),
+        "p50_ms": pct(0.5), "p90_ms": pct(0.9), "p99_ms": pct(0.99), "max_ms": pct(1.0),
+        "error_rate": round(errors / n, 4) if n else 0.0,
+        "not_modified_rate": round(statuses.get(304, 0) / n, 4) if n else 0.0,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "peak_rss_mb": round(peak / 2**20, 1) if peak else None,
+    }
+
+
+async def _main(args) -> List[dict]:
+    scenarios = _scenarios(args)
+    mixes = [_parse_mix(m, scenarios) for m in args.mix]
+    loads = [("rate", r) for r in args.rate] if args.rate else [("concurrency", c) for c in args.concurrency]
+
+    pool = None
+    if args.url:
+        transport = Http(args.url)
+        args.pid = args.server_pid or os.getpid()
+    else:
+        import main
+        from render_pool import RENDER_POOL
+        pool = RENDER_POOL
+        pool.start()
+        transport = InProcess(main.app)
+        args.pid = os.getpid()
+
+    results = []
+    print(f"{'mix':<40} {'load':>10} | {'req/s':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7} | "
+          f"{'err%':>5} {'304%':>5} {'RSS MB':>7}  slo")
+    try:
+        for mix_text, mix in zip(args.mix, mixes):
+            for n, (kind, value) in enumerate(loads):
+                res = await _run(transport, scenarios, mix, args, seed=n, **{kind: value})
+                res.update(mix=mix_text, **{kind: value})
+                res["slo_ok"] = (res["p99_ms"] is not None and res["p99_ms"] <= args.slo_ms
+                                 and res["error_rate"] <= args.max_errors)
+                results.append(res)
+                load = f"{value:g}/s" if kind == "rate" else f"c={value}"
+                rss = f"{res['peak_rss_mb']:.0f}" if res["peak_rss_mb"] else "-"
+                print(f"{mix_text[:40]:<40} {load:>10} | {res['rps']:>7.1f} {res['p50_ms']:>7.1f} {res['p90_ms']:>7.1f} "
+                      f"{res['p99_ms']:>7.1f} {res['max_ms']:>7.1f} | {res['error_rate'] * 100:>5.1f} "
+                      f"{res['not_modified_rate'] * 100:>5.1f} {rss:>7}  {'ok' if res['slo_ok'] else 'FAIL'}")
+    finally:
+        await transport.close()
+        if pool is not None:
+            pool.shutdown()
+
+    for mix_text in args.mix:
+        passing = [r for r in results if r["mix"] == mix_text and r["slo_ok"]]
+        best = max(passing, key=lambda r: r["rps"]) if passing else None
+        verdict = f"{best['rps']:.1f} req/s" if best else "ни одна ступень"
+        print(f"\n{mix_text}: в SLO (p99 <= {args.slo_ms:g} мс, ошибок <= {args.max_errors:.1%}) — {verdict}")
+    return results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="сервер, например http://127.0.0.1:8000; без него — приложение в этом процессе")
+    ap.add_argument("--server-pid", type=int, help="pid uvicorn для RSS (с детьми); по умолчанию RSS генератора")
+    ap.add_argument("--mix", nargs="+", default=[DEFAULT_MIX], help="имя=вес через запятую; несколько смесей — несколько прогонов")
+    load = ap.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, nargs="+", default=[10, 20, 40], help="замкнутый цикл: клиентов")
+    load.add_argument("--rate", type=float, nargs="+", help="открытая нагрузка: запросов/с")
+    ap.add_argument("--seconds", type=float, default=10.0, help="длительность ступени")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    ap.add_argument("--formats", nargs="+", default=["png", "svg"], choices=["png", "svg"])
+    ap.add_argument("--distinct", type=int, default=500, help="вариантов данных на сценарий")
+    ap.add_argument("--revalidate", type=float, default=0.2, help="доля повторов с If-None-Match")
+    ap.add_argument("--long-chars", type=int, default=1200, help="длина данных post_long (ёмкость QR с EC Q ~1600 байт)")
+    ap.add_argument("--slo-ms", type=float, default=500.0)
+    ap.add_argument("--max-errors", type=float, default=0.01)
+    ap.add_argument("--out", help="сохранить результаты (JSON)")
+    args = ap.parse_args()
+
+    results = asyncio.run(_main(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "pid"}, "results": results},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Выбор маски: qrcode.QRCode (util.lost_point на Python) против FastMaskQRCode (штрафы NumPy).
+
+    python -m bench.masks             # сверка матриц на корпусе + время make() по версиям
+    python -m bench.masks --pinned    # плюс закреплённые версия и маска (QR_VERSION/QR_MASK)
+
+Корпус: все типы FORM_SPEC через _compose и vCard iOS/Android через _build_vcard, на всех уровнях EC сервиса.
+Любое расхождение матрицы — код выхода 1.
+"""
+import argparse
+import sys
+import time
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+from qr_encoder import FastMaskQRCode
+
+PEOPLE = [
+    ("Иванов Иван Иванович", "ЗН Цифра", "Ведущий инженер", "Отдел разработки",
+     "ivan.ivanov@company.ru", "+79991234567", "002-8042"),
+    ("Петрова Анна", "ЗН Цифра", "Руководитель направления по работе с ключевыми клиентами",
+     "Департамент продаж и клиентского сервиса", "anna.petrova@company.ru", "+79161234567", "002-8480"),
+    ("Smith John", "Acme", "CTO", "", "john@acme.example", "+15551234567", ""),
+    ("Ли Ва", "ЗН Цифра", "", "", "", "", "002-1000"),
+    ("Константинопольский Александр Владимирович", "Общество с ограниченной ответственностью «ЗН Цифра»",
+     "Главный специалист по информационной безопасности", "Управление ИБ, отдел мониторинга",
+     "aleksandr.konstantinopolskiy@company.ru", "+79031234567", "002-8999"),
+]
+
+
+def corpus():
+    from main import ComposeRequest, _compose
+    from vcard_portal import _build_vcard
+    from bench.svg import SAMPLES
+    for kind, fields in SAMPLES.items():
+        data = _compose(ComposeRequest(type=kind, fields=fields))
+        yield f"compose:{kind}", data, (ERROR_CORRECT_M, ERROR_CORRECT_Q)
+    for os_profile in ("ios", "android"):
+        for i, person in enumerate(PEOPLE):
+            yield f"vcard:{os_profile}:{i}", _build_vcard(os_profile, *person), (ERROR_CORRECT_Q, ERROR_CORRECT_H)
+
+
+def make(cls, data: str, ec: int, version=None, mask=None):
+    qr = cls(version=version, error_correction=ec, box_size=1, border=0, mask_pattern=mask)
+    qr.add_data(data); qr.make(fit=True)
+    return qr
+
+
+def _timeit(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--pinned", action="store_true", help="замерить и режим с закреплёнными версией/маской")
+    args = ap.parse_args()
+
+    mismatches = 0
+    rows = []
+    for name, data, levels in corpus():
+        for ec in levels:
+            ref = make(qrcode.QRCode, data, ec)
+            fast = make(FastMaskQRCode, data, ec)
+            same = ref.version == fast.version and ref.modules == fast.modules
+            mismatches += not same
+            rows.append((name, ec, ref, data, same))
+
+    head = f"{'payload':>18} {'ec':>2} {'ver':>3} | {'qrcode ms':>9} {'numpy ms':>9} {'x':>5}"
+    if args.pinned:
+        head += f" {'pinned ms':>9}"
+    print(head + "  same")
+    ec_name = {ERROR_CORRECT_M: "M", ERROR_CORRECT_Q: "Q", ERROR_CORRECT_H: "H"}
+    for name, ec, ref, data, same in rows:
+        t_ref = _timeit(lambda: make(qrcode.QRCode, data, ec), args.repeat)
+        t_fast = _timeit(lambda: make(FastMaskQRCode, data, ec), args.repeat)
+        line = f"{name:>18} {ec_name[ec]:>2} {ref.version:>3} | {t_ref:>9.2f} {t_fast:>9.2f} {t_ref / t_fast:>5.1f}"
+        if args.pinned:
+            # закрепляем ту версию и маску, что выбрал бы подбор, — картинка та же, подбора нет
+            mask = make(FastMaskQRCode, data, ec).best_mask_pattern()
+            t_pin = _timeit(lambda: make(FastMaskQRCode, data, ec, ref.version, mask), args.repeat)
+            line += f" {t_pin:>9.2f}"
+        print(line + ("  ok" if same else "  DIFF"))
+
+    print(f"\n{len(rows)} матриц, расхождений: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
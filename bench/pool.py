@@ -0,0 +1,58 @@
+"""
+Пропускная способность рендера: тредпул против пула процессов.
+
+    python -m bench.pool                  # воркеры 0 (тредпул), 1, 2, 4 ... до числа ядер
+    python -m bench.pool --workers 0 4 8 --jobs 400
+
+Каждая задача — уникальная фирменная vCard, чтобы не попадать в кэш матриц.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from render_pool import RenderPool
+
+
+def _vcard(i: int) -> str:
+    return "\r\n".join([
+        "BEGIN:VCARD", "VERSION:3.0",
+        f"N:Сотрудник{i};Иван;Иванович;;", f"FN:Сотрудник{i} Иван Иванович",
+        "ORG:ЗН Цифра;Отдел разработки", "TITLE:Инженер",
+        f"EMAIL;TYPE=INTERNET;TYPE=WORK;TYPE=pref:user{i}@example.com",
+        f"TEL;TYPE=WORK;TYPE=VOICE;TYPE=pref:+74957486424,{8000 + i % 1000}",
+        "END:VCARD",
+    ])
+
+
+async def _run(pool: RenderPool, jobs: int, offset: int) -> float:
+    t0 = time.perf_counter()
+    await asyncio.gather(*(pool.render("fixed", _vcard(offset + i)) for i in range(jobs)))
+    return jobs / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    default = [0] + sorted({w for w in (1, 2, 4, 8, 16) if w <= cpus} | {cpus})
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=default)
+    ap.add_argument("--jobs", type=int, default=200)
+    args = ap.parse_args()
+
+    print(f"cpu={cpus}, jobs={args.jobs}")
+    print(f"{'workers':>8} {'mode':>8} {'renders/s':>10} {'speedup':>8}")
+    base = None
+    for n, workers in enumerate(args.workers):
+        pool = RenderPool(workers)
+        pool.start()
+        mode = pool.stats()["mode"]
+        try:
+            rate = asyncio.run(_run(pool, args.jobs, offset=n * args.jobs))
+        finally:
+            pool.shutdown()
+        base = base or rate
+        print(f"{workers:>8} {mode:>8} {rate:>10.1f} {rate / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Профили кодирования: время кодирования против размера ответа.
+
+    python -m bench.profiles          # простой QR (url) 512/2048 и фирменная vCard 768
+
+Растр строится один раз, замеряется только кодирование картинки (encode_image).
+"""
+import argparse
+import time
+
+from qrcode.constants import ERROR_CORRECT_Q
+
+import qr_core
+from qr_core import ENCODE_PROFILES, PLAIN_ONLY_PROFILES, encode_image
+
+URL = "https://example.com/campaign?utm_source=badge&utm_medium=qr&utm_campaign=autumn"
+VCARD = "\r\n".join([
+    "BEGIN:VCARD", "VERSION:3.0", "N:Иванов;Иван;Иванович;;", "FN:Иванов Иван Иванович",
+    "ORG:ЗН Цифра;Отдел разработки", "TITLE:Ведущий инженер",
+    "EMAIL;TYPE=INTERNET;TYPE=WORK;TYPE=pref:ivan.ivanov@company.ru",
+    "TEL;TYPE=WORK;TYPE=VOICE;TYPE=pref:+74957486424,8042", "TEL;TYPE=CELL;TYPE=VOICE:+79991234567",
+    "END:VCARD",
+])
+
+
+def _plain(size: int):
+    m = qr_core.encode_matrix(URL, ERROR_CORRECT_Q)
+    return qr_core.indexed_image(qr_core.rasterize(qr_core.module_indices(m), 2, size),
+                                 qr_core.palette("white", "black"))
+
+
+def _fixed():
+    m = qr_core.encode_matrix(VCARD, qr_core.QR_FIXED_ECLEVEL)
+    canvas = qr_core.rasterize(qr_core.module_indices(m, finders=True), qr_core.QR_FIXED_BORDER, qr_core.QR_FIXED_SIZE)
+    img = qr_core.indexed_image(canvas, qr_core._fixed_palette()).convert("RGB")
+    return qr_core._paste_logo_with_pad(img, qr_core.logo_template(qr_core.QR_FIXED_SIZE))
+
+
+def _timeit(img, profile: str, repeat: int) -> float:
+    encode_image(img, profile)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        encode_image(img, profile)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    cases = [("url 512", _plain(512), True), ("url 2048", _plain(2048), True),
+             (f"vcard {qr_core.QR_FIXED_SIZE}", _fixed(), False)]
+    print(f"{'case':>10} {'profile':>8} | {'bytes':>8} {'encode ms':>10}")
+    for name, img, plain in cases:
+        for profile in ENCODE_PROFILES:
+            if profile in PLAIN_ONLY_PROFILES and not plain:
+                continue
+            size = len(encode_image(img, profile))
+            print(f"{name:>10} {profile:>8} | {size:>8} {_timeit(img, profile, args.repeat):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Сравнение растеризатора на NumPy с прежним путём (PIL: рисование box_size=10 + resize).
+
+    python -m bench.raster            # таблица: время и пик памяти по размерам 64..2048
+
+Растр меряется от уже закодированной матрицы, PNG — растр плюс сжатие.
+Память — прирост VmHWM в отдельном процессе на каждый замер,
+потому что буферы PIL не видны tracemalloc.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+SIZES = [64, 256, 512, 768, 1024, 2048]
+PAYLOAD = "https://example.com/campaign?utm_source=badge&utm_medium=qr&utm_campaign=autumn"
+
+
+def _legacy_qr(data: str, margin: int = 2):
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_Q
+    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_Q, box_size=10, border=margin)
+    qr.add_data(data); qr.make(fit=True)
+    return qr
+
+
+def legacy_raster(qr, size: int, fill: str = "black", back: str = "white"):
+    # как было: рисуем прямоугольниками при box_size=10 и ресайзим весь RGB-кадр
+    return qr.make_image(fill_color=fill, back_color=back).convert("RGB").resize((size, size))
+
+
+def numpy_raster(matrix, size: int, margin: int = 2, fill: str = "black", back: str = "white"):
+    from qr_core import indexed_image, module_indices, palette, rasterize
+    return indexed_image(rasterize(module_indices(matrix), margin, size), palette(back, fill)).convert("RGB")
+
+
+def _png(img) -> bytes:
+    buf = BytesIO(); img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _inputs():
+    from qr_core import encode_matrix
+    from qrcode.constants import ERROR_CORRECT_Q
+    return {"legacy": (legacy_raster, _legacy_qr(PAYLOAD)),
+            "numpy": (numpy_raster, encode_matrix(PAYLOAD, ERROR_CORRECT_Q))}
+
+
+def _hwm_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(path: str, size: int) -> None:
+    fn, arg = _inputs()[path]
+    _png(fn(arg, 64))                    # прогрев импортов
+    before = _hwm_kb()
+    _png(fn(arg, size))
+    print(json.dumps({"peak_kb": _hwm_kb() - before}))
+
+
+def _timeit(fn, *args, repeat: int) -> float:
+    fn(*args)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'size':>6} | {'raster legacy ms':>16} {'raster numpy ms':>15} | "
+          f"{'png legacy ms':>13} {'png numpy ms':>12} | {'rss legacy KiB':>14} {'rss numpy KiB':>13}")
+    inputs = _inputs()
+    for size in SIZES:
+        row = []
+        for stage in (lambda fn, arg: fn(arg, size), lambda fn, arg: _png(fn(arg, size))):
+            for path in ("legacy", "numpy"):
+                row.append(_timeit(stage, *inputs[path], repeat=args.repeat))
+        rss = []
+        for path in ("legacy", "numpy"):
+            out = subprocess.run([sys.executable, "-m", "bench.raster", "--child", path, str(size)],
+                                 capture_output=True, text=True, check=True).stdout
+            rss.append(json.loads(out)["peak_kb"])
+        print(f"{size:>6} | {row[0]:>16.2f} {row[1]:>15.2f} | {row[2]:>13.2f} {row[3]:>12.2f} | "
+              f"{rss[0]:>14} {rss[1]:>13}")
+
+
+if __name__ == "__main__":
+    main()
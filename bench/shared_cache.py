@@ -0,0 +1,89 @@
+"""
+Стресс общего mmap-кэша: несколько процессов одновременно пишут и читают один файл.
+
+    python -m bench.shared_cache                        # 4 процесса x 20000 операций, кэш 8 МиБ
+    python -m bench.shared_cache --procs 8 --size 1     # маленький файл — журнал крутится постоянно
+
+Содержимое каждой записи однозначно выводится из ключа, поэтому любой прочитанный ответ проверяется
+побайтно; «bad» обязан быть 0. Проценты попаданий зависят от размера файла и разброса ключей.
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from shared_cache import SharedCache
+
+
+def _payload(i: int) -> bytes:
+    # длина от сотен байт до ~64 КиБ, как у PNG/SVG разных версий
+    seed = hashlib.sha256(str(i).encode()).digest()
+    return seed * (1 + (i * 7919) % 2048)
+
+
+def _etag(i: int) -> str:
+    return hashlib.sha256(f"key-{i}".encode()).hexdigest()
+
+
+def _worker(path, size, slots, keys, ops, seed, out):
+    cache = SharedCache(path, size, slots, 4 * 1024 * 1024)
+    rnd = random.Random(seed)
+    bad = hits = gets = puts = 0
+    t0 = time.perf_counter()
+    for _ in range(ops):
+        i = int(rnd.paretovariate(1.2)) % keys       # «популярные» ключи встречаются чаще
+        content = cache.get(_etag(i))
+        gets += 1
+        if content is None:
+            cache.put(_etag(i), _payload(i))
+            puts += 1
+        elif content != _payload(i):
+            bad += 1
+        else:
+            hits += 1
+    out.put((os.getpid(), gets, hits, puts, bad, cache.corrupt, time.perf_counter() - t0))
+    cache.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--ops", type=int, default=20000)
+    ap.add_argument("--keys", type=int, default=2000)
+    ap.add_argument("--size", type=int, default=8, help="объём журнала, МиБ")
+    ap.add_argument("--slots", type=int, default=4096)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="qr-shared-"), "cache.bin")
+    size = args.size * 1024 * 1024
+    SharedCache(path, size, args.slots, 4 * 1024 * 1024).close()     # создать файл до старта воркеров
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, size, args.slots, args.keys, args.ops, n, out))
+             for n in range(args.procs)]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - t0
+
+    print(f"{'pid':>7} {'gets':>7} {'hits':>6} {'puts':>6} {'bad':>4} {'crc':>4} {'ops/s':>8}")
+    total_bad = 0
+    for pid, gets, hits, puts, bad, corrupt, secs in results:
+        total_bad += bad
+        print(f"{pid:>7} {gets:>7} {hits:>6} {puts:>6} {bad:>4} {corrupt:>4} {gets / secs:>8.0f}")
+    gets = sum(r[1] for r in results)
+    print(f"\n{args.procs} процессов, {gets / wall:.0f} get/s суммарно, "
+          f"попаданий {sum(r[2] for r in results) / gets:.1%}, битых ответов: {total_bad}")
+    os.unlink(path)
+    return 1 if total_bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Холодный старт: импорт, время до /healthz и /readyz, первый и второй запрос — с прогревом и без.
+
+    python -m bench.startup                       # QR_WARMUP=1 и 0, тредпул, 3 запуска на режим
+    python -m bench.startup --workers 0 2 --runs 5 --out startup.json
+
+«import» — `import main` в чистом процессе (и что из тяжёлого успело загрузиться);
+дальше каждый запуск — новый uvicorn на свободном порту: «live» — от запуска до первого 200 на /healthz,
+«ready» — до 200 на /readyz, «first»/«second» — два GET /qr с новыми данными сразу после готовности
+(промах всех кэшей). Без прогрева первый запрос платит за импорт numpy/PIL/qrcode, лого и первый zlib.
+В отчёте медианы по запускам, мс.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+HEAVY = ("numpy", "PIL", "qrcode")
+IMPORT_PROBE = ("import sys, time; t = time.perf_counter(); import main; "
+                "print(time.perf_counter() - t, *[m for m in %r if m in sys.modules])" % (HEAVY,))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=30) as r:
+            r.read()
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def _wait(url: str, t0: float, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        if _get(url) == 200:
+            return (time.perf_counter() - t0) * 1000
+        time.sleep(0.01)
+    raise RuntimeError(f"нет ответа 200 от {url}")
+
+
+def _import_ms(env: dict) -> tuple:
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, check=True,
+                         capture_output=True, text=True).stdout.split()
+    return float(out[0]) * 1000, out[1:]
+
+
+def _start_once(env: dict, timeout: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = t0 + timeout
+        res = {"live_ms": _wait(f"{base}/healthz", t0, deadline), "ready_ms": _wait(f"{base}/readyz", t0, deadline)}
+        for name in ("first_ms", "second_ms"):
+            t = time.perf_counter()
+            status = _get(f"{base}/qr?data=startup-{uuid.uuid4().hex}")
+            if status != 200:
+                raise RuntimeError(f"/qr ответил {status}")
+            res[name] = (time.perf_counter() - t) * 1000
+        return res
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--workers", type=int, nargs="+", default=[0], help="QR_RENDER_WORKERS для каждого режима")
+    ap.add_argument("--timeout", type=float, default=60.0, help="сек на запуск сервера")
+    ap.add_argument("--out", help="сохранить результаты (JSON)")
+    args = ap.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+    import_ms, loaded = zip(*(_import_ms(env) for _ in range(args.runs)))
+    print(f"import main: {statistics.median(import_ms):.0f} мс; загружено из тяжёлого: {', '.join(loaded[0]) or 'ничего'}\n")
+
+    results = {"import_ms": statistics.median(import_ms), "heavy_loaded": list(loaded[0]), "modes": []}
+    print(f"{'warmup':>6} {'workers':>7} | {'live':>7} {'ready':>7} {'first':>7} {'second':>7}")
+    for workers in args.workers:
+        for warmup in ("1", "0"):
+            runs = [_start_once({**env, "QR_WARMUP": warmup, "QR_RENDER_WORKERS": str(workers)}, args.timeout)
+                    for _ in range(args.runs)]
+            med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+            results["modes"].append({"warmup": warmup == "1", "workers": workers, **med})
+            print(f"{'on' if warmup == '1' else 'off':>6} {workers:>7} | {med['live_ms']:>7.0f} {med['ready_ms']:>7.0f} "
+                  f"{med['first_ms']:>7.1f} {med['second_ms']:>7.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Бенчмарк всего конвейера QR: от _compose до полного HTTP-запроса через ASGI в процессе.
+
+    python -m bench                               # прогнать всё, таблица в stdout
+    python -m bench --out results.json            # + сохранить результаты (JSON)
+    python -m bench --compare baseline.json       # сравнить с базой, код выхода 1 при регрессии
+    python -m bench --only raster --quick         # подмножество, короткие замеры
+
+Каждый кейс повторяется, пока не наберётся --min-time секунд (и не меньше --min-runs раз);
+в отчёт идут медиана, p90 и минимум одной итерации в миллисекундах.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, Dict, List, Tuple
+
+SIZES = [64, 512, 768, 2048]
+PAYLOAD_LENGTHS = [16, 64, 256, 1024]
+
+
+def _payload(n: int) -> str:
+    base = "https://example.com/p?q=" + "abcdefghijklmnopqrstuvwxyz0123456789" * (n // 36 + 1)
+    return base[:n]
+
+
+def _cases() -> List[Tuple[str, Callable[[], Callable]]]:
+    """(имя, фабрика) — фабрика готовит входы и возвращает функцию одной итерации."""
+    from qrcode.constants import ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+    import qr_core
+    from main import ComposeRequest, _compose
+    from bench.svg import SAMPLES
+    from bench.profiles import VCARD
+
+    cases = []
+
+    for t, fields in SAMPLES.items():
+        req = ComposeRequest(type=t, fields=fields)
+        cases.append((f"compose/{t}", lambda req=req: (lambda: _compose(req))))
+
+    for n in PAYLOAD_LENGTHS:
+        data = _payload(n)
+        def fit(data=data):
+            def run():
+                qr_core.encode_matrix.cache_clear()
+                qr_core.encode_matrix(data, ERROR_CORRECT_Q)
+            return run
+        cases.append((f"encode/fit/len={n}", fit))
+    cases.append(("encode/fit/vcard", lambda: (lambda: (qr_core.encode_matrix.cache_clear(),
+                                                        qr_core.encode_matrix(VCARD, qr_core.QR_FIXED_ECLEVEL)))))
+
+    def matrix(data=_payload(64), ec=ERROR_CORRECT_Q):
+        qr_core.encode_matrix.cache_clear()
+        return qr_core.encode_matrix(data, ec)
+
+    for size in SIZES:
+        def raster(size=size):
+            idx = qr_core.module_indices(matrix())
+            return lambda: qr_core.rasterize(idx, 2, size)
+        cases.append((f"raster/size={size}", raster))
+
+    cases.append(("finders/vcard", lambda: (lambda m=matrix(VCARD, qr_core.QR_FIXED_ECLEVEL):
+                                            qr_core.module_indices(m, finders=True))))
+
+    def logo():
+        tpl = qr_core.logo_template(qr_core.QR_FIXED_SIZE)
+        m = matrix(VCARD, qr_core.QR_FIXED_ECLEVEL)
+        canvas = qr_core.rasterize(qr_core.module_indices(m, finders=True), qr_core.QR_FIXED_BORDER, qr_core.QR_FIXED_SIZE)
+        base = qr_core.indexed_image(canvas, qr_core._fixed_palette()).convert("RGB")
+        return lambda: qr_core._paste_logo_with_pad(base.copy(), tpl)
+    cases.append(("logo/paste", logo))
+
+    for size in SIZES:
+        def png(size=size):
+            img = qr_core.indexed_image(qr_core.rasterize(qr_core.module_indices(matrix()), 2, size),
+                                        qr_core.palette("white", "black"))
+            return lambda: qr_core.encode_image(img, "default")
+        cases.append((f"png/encode/size={size}", png))
+
+    for n in PAYLOAD_LENGTHS:
+        def svg(n=n):
+            m = matrix(_payload(n), ERROR_CORRECT_M)
+            return lambda: qr_core.svg_document(m, 2, "black", "white")
+        cases.append((f"svg/encode/len={n}", svg))
+
+    cases.append(("render/fixed_png", lambda: (lambda: (qr_core.encode_matrix.cache_clear(),
+                                                        qr_core.build_png_fixed_with_logo_and_finders(VCARD)))))
+    return cases
+
+
+def _http_cases() -> List[Tuple[str, Callable[[], Callable]]]:
+    """Асинхронные кейсы: фабрика возвращает корутинную функцию одной итерации."""
+    import main
+    import qr_core
+    from render_cache import RENDER_CACHE
+    from bench.asgi import call
+
+    def cold():
+        RENDER_CACHE.clear()
+        qr_core.encode_matrix.cache_clear()
+
+    vcard_q = {"fn": "Иванов Иван Иванович", "org": "ЗН Цифра", "title": "Инженер", "dept": "Отдел",
+               "email": "ivan@company.ru", "mobile": "+79991234567", "work_short": "002-8042"}
+    cases = []
+    for size in SIZES:
+        q = {"data": _payload(64), "size": size}
+        async def png(q=q):
+            cold(); return await call(main.app, "GET", "/qr", q)
+        cases.append((f"http/qr/png/size={size}", lambda png=png: png))
+    for n in PAYLOAD_LENGTHS:
+        q = {"data": _payload(n), "format": "svg"}
+        async def svg(q=q):
+            cold(); return await call(main.app, "GET", "/qr", q)
+        cases.append((f"http/qr/svg/len={n}", lambda svg=svg: svg))
+    body = json.dumps({"data": _payload(1024)}).encode()
+    async def post():
+        cold(); return await call(main.app, "POST", "/qr", headers={"content-type": "application/json"}, body=body)
+    cases.append(("http/qr/post/len=1024", lambda: post))
+
+    async def vcard():
+        cold(); return await call(main.app, "GET", "/qr/vcard", vcard_q)
+    cases.append(("http/vcard/cold", lambda: vcard))
+    async def vcard_warm():
+        return await call(main.app, "GET", "/qr/vcard", vcard_q)
+    cases.append(("http/vcard/cached", lambda: vcard_warm))
+    async def healthz():
+        return await call(main.app, "GET", "/healthz")
+    cases.append(("http/healthz", lambda: healthz))
+    return cases
+
+
+def _summary(samples: List[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p90_ms": round(samples[int(0.9 * (len(samples) - 1))], 4),
+        "min_ms": round(samples[0], 4),
+        "runs": len(samples),
+    }
+
+
+def _measure(fn: Callable, min_time: float, min_runs: int) -> dict:
+    fn()
+    samples, deadline = [], time.perf_counter() + min_time
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        t0 = time.perf_counter(); fn(); samples.append((time.perf_counter() - t0) * 1000)
+    return _summary(samples)
+
+
+async def _ameasure(fn: Callable, min_time: float, min_runs: int, expect: int = 200) -> dict:
+    # кейс возвращает (status, headers, body): быстрый 4xx/5xx не должен сойти за ускорение
+    async def checked():
+        status = (await fn())[0]
+        if status != expect:
+            raise RuntimeError(f"HTTP {status}, ожидался {expect}")
+    await checked()
+    samples, deadline = [], time.perf_counter() + min_time
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        t0 = time.perf_counter(); await checked(); samples.append((time.perf_counter() - t0) * 1000)
+    return _summary(samples)
+
+
+def _versions() -> Dict[str, str]:
+    out = {"python": platform.python_version()}
+    for pkg in ("qrcode", "Pillow", "numpy", "fastapi", "starlette", "pydantic"):
+        try:
+            out[pkg] = metadata.version(pkg)
+        except metadata.PackageNotFoundError:
+            out[pkg] = "-"
+    return out
+
+
+def run(only: str, min_time: float, min_runs: int) -> dict:
+    results = {}
+    for name, factory in _cases():
+        if only and only not in name:
+            continue
+        results[name] = _measure(factory(), min_time, min_runs)
+        print(f"{name:<32} {results[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    async def http():
+        for name, factory in _http_cases():
+            if only and only not in name:
+                continue
+            try:
+                results[name] = await _ameasure(factory(), min_time, min_runs)
+            except RuntimeError as e:
+                raise SystemExit(f"{name}: {e}") from e
+            print(f"{name:<32} {results[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+    asyncio.run(http())
+
+    return {
+        "meta": {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "platform": platform.platform(), "versions": _versions(),
+                 "min_time": min_time, "min_runs": min_runs},
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    print(f"{'case':<32} {'base ms':>10} {'now ms':>10} {'delta':>8}")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<32} {'-':>10} {cur['median_ms']:>10.3f} {'new':>8}")
+            continue
+        delta = cur["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        flag = ""
+        if delta > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<32} {base['median_ms']:>10.3f} {cur['median_ms']:>10.3f} {delta:>+7.1%}{flag}")
+    bv, cv = baseline.get("meta", {}).get("versions", {}), current["meta"]["versions"]
+    for pkg in sorted(set(bv) | set(cv)):
+        if bv.get(pkg) != cv.get(pkg):
+            print(f"version {pkg}: {bv.get(pkg)} -> {cv.get(pkg)}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench")
+    ap.add_argument("--out", help="куда записать результаты JSON")
+    ap.add_argument("--compare", metavar="BASELINE", help="JSON прошлого прогона для сравнения")
+    ap.add_argument("--current", help="не гонять заново, а сравнить этот JSON")
+    ap.add_argument("--threshold", type=float, default=0.15, help="допустимое замедление медианы (0.15 = 15%%)")
+    ap.add_argument("--only", default="", help="подстрока имени кейса")
+    ap.add_argument("--min-time", type=float, default=0.5)
+    ap.add_argument("--min-runs", type=int, default=5)
+    ap.add_argument("--quick", action="store_true", help="--min-time 0.05 --min-runs 3")
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.min_time, args.min_runs = 0.05, 3
+
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        current = run(args.only, args.min_time, args.min_runs)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=1)
+    if not args.compare:
+        if not args.out:
+            json.dump(current, sys.stdout, ensure_ascii=False, indent=1)
+            print()
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
@@ -0,0 +1,71 @@
+"""
+SVG: прежний qrcode SvgImage (<rect> на каждый модуль) против собственного writer'а (один <path>).
+
+    python -m bench.svg               # размер и время генерации по каждому типу из FORM_SPEC
+
+«ms path» — кодирование + запись документа, «ms writer» — только запись по готовой матрице.
+"""
+import argparse
+import time
+from io import BytesIO
+
+SAMPLES = {
+    "url":   {"url": "https://example.com/campaign?utm_source=badge&utm_medium=qr"},
+    "text":  {"text": "Добро пожаловать в офис! Wi-Fi на ресепшене, кофе на 3 этаже. " * 3},
+    "tel":   {"number": "+79991234567"},
+    "email": {"email": "ivan.ivanov@company.ru"},
+    "sms":   {"number": "+79991234567", "body": "Здравствуйте! Перезвоните, пожалуйста."},
+    "wifi":  {"auth": "WPA", "ssid": "Office-Guest", "password": "s3cret-pass-2024", "hidden": False},
+    "vcard": {"last": "Иванов", "first": "Иван", "middle": "Иванович", "org": "ЗН Цифра",
+              "title": "Ведущий инженер", "tel": "+79991234567", "email": "ivan.ivanov@company.ru",
+              "url": "https://company.ru", "note": "Отдел разработки, корпус Б, каб. 412"},
+}
+
+
+def legacy_svg(data: str, margin: int = 2) -> bytes:
+    import qrcode, qrcode.image.svg
+    img = qrcode.make(data, image_factory=qrcode.image.svg.SvgImage, border=margin)
+    buf = BytesIO(); img.save(buf)
+    return buf.getvalue()
+
+
+def path_svg(data: str, margin: int = 2) -> bytes:
+    from qr_core import svg_document, encode_matrix
+    from qrcode.constants import ERROR_CORRECT_M
+    encode_matrix.cache_clear()          # честно: кодирование входит в замер, как и у qrcode.make
+    return svg_document(encode_matrix(data, ERROR_CORRECT_M), margin, "black", "white")
+
+
+def writer_only(data: str, margin: int = 2) -> bytes:
+    from qr_core import svg_document, encode_matrix
+    from qrcode.constants import ERROR_CORRECT_M
+    return svg_document(encode_matrix(data, ERROR_CORRECT_M), margin, "black", "white")
+
+
+def _timeit(fn, data: str, repeat: int) -> float:
+    fn(data)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(data)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main() -> None:
+    from main import FORM_SPEC, ComposeRequest, _compose
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'type':>6} {'chars':>6} | {'bytes legacy':>12} {'bytes path':>10} {'ratio':>6} | "
+          f"{'ms legacy':>9} {'ms path':>8} {'ms writer':>9}")
+    for t in FORM_SPEC["types"]:
+        data = _compose(ComposeRequest(type=t["key"], fields=SAMPLES[t["key"]]))
+        old, new = legacy_svg(data), path_svg(data)
+        print(f"{t['key']:>6} {len(data):>6} | {len(old):>12} {len(new):>10} {len(new) / len(old):>6.2f} | "
+              f"{_timeit(legacy_svg, data, args.repeat):>9.2f} {_timeit(path_svg, data, args.repeat):>8.2f} "
+              f"{_timeit(writer_only, data, args.repeat):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# conditional.py
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Last-Modified по умолчанию — старт процесса: после деплоя (новый рендерер) клиенты один раз получат 200
+STARTED_AT = int(time.time())
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match: '*', список через запятую, слабые W/"..." и кавычки — сравниваем без них."""
+    if not header:
+        return False
+    for token in header.split(","):
+        token = token.strip()
+        if token == "*":
+            return True
+        if token.startswith("W/"):
+            token = token[2:]
+        if token.strip('"') == etag:
+            return True
+    return False
+
+
+def _modified_since(header: Optional[str], last_modified: int) -> bool:
+    if not header:
+        return True
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return True     # битую дату игнорируем, как велит RFC 9110
+    return last_modified > since
+
+
+def not_modified(request: Request, etag: str, last_modified: int = STARTED_AT) -> bool:
+    # If-Modified-Since смотрим только без If-None-Match
+    inm = request.headers.get("If-None-Match")
+    if inm is not None:
+        return etag_matches(inm, etag)
+    return not _modified_since(request.headers.get("If-Modified-Since"), last_modified)
+
+
+def http_date(ts: float) -> str:
+    return formatdate(ts, usegmt=True)
+
+
+def precheck(request: Request, *, etag: str, headers: dict, media_type: str,
+             last_modified: int = STARTED_AT, length: Optional[int] = None) -> Optional[Response]:
+    """
+    Ответ, который можно дать до рендера: 304 по валидаторам или HEAD.
+    headers — те же заголовки, что уйдут с 200 (ETag, Cache-Control, Content-Disposition, Last-Modified).
+    None — надо рендерить.
+    """
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+    if request.method == "HEAD":
+        resp = Response(status_code=200, headers=headers, media_type=media_type)
+        if length is None:
+            del resp.headers["content-length"]      # длину знаем только для уже закэшированной картинки
+        else:
+            resp.headers["content-length"] = str(length)
+        return resp
+    return None
@@ -0,0 +1,114 @@
+# fast_path.py
+import os
+import re
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from admission import Overloaded
+from qr_core import FIXED_PROFILE_PATTERN, PROFILE_PATTERN
+
+# 1 — GET/HEAD /qr и /qr/vcard минуя маршрутизацию и валидацию FastAPI (те же эндпоинты, те же ответы)
+QR_FAST_PATH = os.getenv("QR_FAST_PATH", "0") == "1"
+
+REQUIRED = object()
+
+# те же ограничения, что в Query(...) у эндпоинтов: (по умолчанию, pattern | (min, max) | None)
+FAST_ROUTES = {
+    "/qr": {
+        "data": (REQUIRED, None),
+        "format": ("png", "^(png|svg)$"),
+        "size": (512, (64, 2048)),
+        "margin": (2, (0, 8)),
+        "download": (0, (0, 1)),
+        "filename": ("qr", None),
+        "fill_color": ("black", None),
+        "back_color": ("white", None),
+        "profile": ("default", PROFILE_PATTERN),
+    },
+    "/qr/vcard": {
+        "fn": (REQUIRED, None),
+        "org": (REQUIRED, None),
+        "title": ("", None),
+        "dept": ("", None),
+        "email": ("", None),
+        "mobile": ("", None),
+        "work_short": ("", None),
+        "os": ("ios", "^(ios|android)$"),
+        "filename": ("vcard_qr", None),
+        "format": ("png", "^(png|svg)$"),
+        "profile": ("default", FIXED_PROFILE_PATTERN),
+    },
+}
+FAST_DATA_LIMIT = 4000      # как в qr_get: длиннее — 413 от FastAPI
+
+
+def parse_query(spec: dict, query_string: bytes) -> Optional[dict]:
+    """Аргументы эндпоинта или None, если что-то необычно — тогда запрос обработает FastAPI."""
+    params = {}
+    for k, v in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        if k in params:
+            return None             # повторы — пусть решает FastAPI
+        params[k] = v
+    args = {}
+    for name, (default, rule) in spec.items():
+        value = params.get(name)
+        if value is None:
+            if default is REQUIRED:
+                return None
+            args[name] = default
+        elif isinstance(rule, tuple):
+            if not (value.isascii() and value.isdigit()):
+                return None         # "+5", "5.0", " 5" — крайние случаи приведения оставляем pydantic
+            n = int(value)
+            if not rule[0] <= n <= rule[1]:
+                return None
+            args[name] = n
+        elif rule is not None and not re.fullmatch(rule, value):
+            return None
+        else:
+            args[name] = value
+    if len(args.get("data", "")) > FAST_DATA_LIMIT:
+        return None
+    return args
+
+
+class FastPathMiddleware:
+    """
+    Сырой ASGI перед роутером FastAPI: для GET/HEAD /qr и /qr/vcard сам разбирает query
+    и вызывает тот же эндпоинт с готовыми аргументами. Стоит внутри CORS, поэтому заголовки CORS остаются.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+        self._endpoints = None
+
+    def _endpoint(self, path: str):
+        if self._endpoints is None:
+            self._endpoints = {
+                route.path: route.endpoint for route in self.router.routes
+                if getattr(route, "path", None) in FAST_ROUTES and "GET" in (getattr(route, "methods", None) or ())
+            }
+        return self._endpoints.get(path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        spec = FAST_ROUTES.get(scope["path"])
+        args = parse_query(spec, scope["query_string"]) if spec is not None else None
+        endpoint = self._endpoint(scope["path"]) if args is not None else None
+        if endpoint is None:
+            return await self.app(scope, receive, send)
+        try:
+            response = await endpoint(Request(scope, receive), **args)
+        except Overloaded as e:
+            # повтор через FastAPI снова встал бы в очередь допуска — отвечаем как его обработчик
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+        except HTTPException:
+            # ошибки оформляет FastAPI (тело, заголовки) — отдаём запрос ему целиком
+            return await self.app(scope, receive, send)
+        await response(scope, receive, send)
@@ -1,29 +1,138 @@
 from fastapi import FastAPI, Query, Response, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
-import qrcode, qrcode.image.svg
-from qrcode.constants import ERROR_CORRECT_Q
-from io import BytesIO
+from contextlib import asynccontextmanager
+import asyncio
 import hashlib
+import logging
+import os
+import time
+import anyio.to_thread
+
+from admission import ADMISSION, REJECTED
+from conditional import STARTED_AT, http_date, precheck
+from qr_core import (
+    EC_NAMES,
+    ENCODE_PROFILES,
+    PLAIN_ONLY_PROFILES,
+    PROFILE_PATTERN,
+    QR_FIXED_LOGO_PATH,
+    QR_FIXED_SIZE,
+    PNG_RENDER_VERSION,
+    SVG_RENDER_VERSION,
+    logo_png,
+    matrix_ec,
+    profile_media,
+    style_mtime,
+    style_signature,
+    valid_color,
+)
+from metrics import counter, gauge, render_prometheus, track
+from fast_path import QR_FAST_PATH, FastPathMiddleware
+from render_cache import RENDER_CACHE
+from render_pool import RENDER_POOL
 
 # наши роуты для портала (vCard)
 from vcard_portal import router as vcard_router
 
-app = FastAPI(title="QR Generator", version="1.4.1")
+# 0 — без прогрева: готовы сразу после старта, первый запрос платит за импорт и первый рендер
+QR_WARMUP = os.getenv("QR_WARMUP", "1") == "1"
+
+# liveness (/healthz) — процесс отвечает; readiness (/readyz) — прогрев закончен
+# logo — путь загруженного лого; null — лого нет (фирменный стиль без него) или прогрев выключен
+WARMUP = {"state": "starting", "seconds": None, "error": None, "logo": None}
+
+async def _warmup():
+    t0 = time.perf_counter()
+    try:
+        samples = [_compose(ComposeRequest(type=t["key"], fields=_sample_fields(t["key"]))) for t in FORM_SPEC["types"]]
+        logo = await anyio.to_thread.run_sync(RENDER_POOL.warm, samples)
+    except Exception as e:
+        logging.getLogger("uvicorn.error").exception("QR warmup failed")
+        WARMUP.update(state="failed", error=repr(e))
+        return
+    WARMUP.update(state="ready", seconds=round(time.perf_counter() - t0, 3), logo=QR_FIXED_LOGO_PATH if logo else None)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # прогрев — фоном: сервер принимает соединения сразу, /healthz отвечает, /readyz ждёт прогрева
+    if QR_WARMUP:
+        WARMUP["state"] = "warming"
+        task = asyncio.create_task(_warmup())
+    else:
+        RENDER_POOL.start()
+        WARMUP["state"] = "ready"
+        task = None
+    yield
+    if task is not None:
+        await task          # тред прогрева не прервать; пул гасим, когда он дошёл до конца
+    RENDER_POOL.shutdown()
+
+app = FastAPI(title="QR Generator", version="1.4.1", lifespan=lifespan)
 
 # ------------------------ CORS / HEALTH ------------------------
+# быстрый путь добавляется раньше CORS, значит, оказывается внутри него: CORS-заголовки те же
+if QR_FAST_PATH:
+    app.add_middleware(FastPathMiddleware, router=app.router)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # в проде — ограничь доменом портала
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "HEAD", "POST", "OPTIONS"],
     allow_headers=["*"],
 )
 
+# async: не ходит через тредпул, поэтому отвечает и когда тот забит рендерами
 @app.get("/healthz")
-def healthz():
+async def healthz():
     return {"status": "ok"}
 
+@app.get("/readyz")
+async def readyz():
+    # пул процессов не поднялся и после пересоздания — рендеры падают, трафик сюда не нужен
+    ready = WARMUP["state"] == "ready" and not RENDER_POOL.broken
+    return JSONResponse({**WARMUP, "render_pool_broken": RENDER_POOL.broken}, status_code=200 if ready else 503)
+
+@app.get("/stats")
+def stats():
+    return {"render_cache": RENDER_CACHE.stats(), "render_pool": RENDER_POOL.stats(), "admission": ADMISSION.stats()}
+
+def _runtime_gauges():
+    # лимитер тредпула anyio: через него идут sync-роуты и рендер в режиме без процессов
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    yield gauge("qr_threadpool_busy", "Занятые слоты тредпула", limiter.borrowed_tokens)
+    yield gauge("qr_threadpool_limit", "Размер тредпула", int(limiter.total_tokens))
+    yield gauge("qr_threadpool_waiting", "Задачи в очереди тредпула", limiter.statistics().tasks_waiting)
+    pool = RENDER_POOL.stats()
+    yield gauge("qr_render_queue_depth", "Рендеры в работе и в очереди", pool["queue_depth"])
+    yield gauge("qr_render_workers", "Процессы-воркеры рендера (0 — тредпул)", pool["workers"])
+    yield counter("qr_render_pool_restarts", "Пересоздания пула процессов после гибели воркера", pool["restarts"])
+    yield gauge("qr_render_pool_broken", "1 — пул сломан и после пересоздания", int(pool["broken"]))
+    admission = ADMISSION.stats()
+    yield gauge("qr_admission_active", "Рендеры, допущенные лимитом", admission["active"])
+    yield gauge("qr_admission_waiting", "Рендеры в очереди допуска", admission["waiting"])
+    yield gauge("qr_admission_batch_active", "Рендеры строк выгрузок под допуском", admission["batch_active"])
+    yield gauge("qr_admission_batch_waiting", "Строки выгрузок, ждущие слот", admission["batch_waiting"])
+    yield REJECTED.render()
+    cache = RENDER_CACHE.stats()
+    shared = cache.pop("shared") or {}
+    for k, v in cache.items():
+        if k in ("hits", "misses", "merged", "evictions"):
+            yield counter(f"qr_render_cache_{k}", f"RenderCache: {k}", v)
+        else:
+            yield gauge(f"qr_render_cache_{k}", f"RenderCache: {k}", v)
+    for k in ("hits", "misses", "stores", "corrupt"):
+        if k in shared:
+            yield counter(f"qr_shared_cache_{k}", f"SharedCache (этот воркер): {k}", shared[k])
+    if "written" in shared:
+        yield gauge("qr_shared_cache_written", "SharedCache: записано байт в кольцо", shared["written"])
+
+@app.get("/metrics")
+async def metrics():
+    # async — лимитер тредпула читается из event loop
+    return PlainTextResponse(render_prometheus(_runtime_gauges()), media_type="text/plain; version=0.0.4")
+
 # ------------------------ FORM SPEC (как было) ------------------------
 FORM_SPEC = {
     "types": [
@@ -67,14 +176,25 @@ FORM_SPEC = {
         "format": ["png","svg"],
         "size":   {"min":64, "max":2048, "default":512},
         "margin": {"min":0,  "max":8,    "default":2},
-        "colors_supported_for_png": True
+        "profile": {"options": list(ENCODE_PROFILES), "default": "default"},
+        "style":   {"options": ["plain", "fixed"], "default": "plain"},
+        "colors_supported_for_png": True,
+        "colors_supported_for_svg": True
     }
 }
 
 @app.get("/form-spec")
-def form_spec():
+async def form_spec():
     return FORM_SPEC
 
+def _sample_fields(kind: str) -> dict:
+    # типовые значения формы для прогрева: подсказка, первый вариант или подпись поля
+    fields = {}
+    for f in FORM_SPEC["fields"][kind]:
+        fields[f["key"]] = False if f["type"] == "checkbox" else (
+            f.get("placeholder") or (f.get("options") or [f["label"]])[0])
+    return fields
+
 # ------------------------ COMPOSE (как было) ------------------------
 class ComposeRequest(BaseModel):
     type: str = Field(..., description="url|text|tel|email|sms|wifi|vcard")
@@ -125,38 +245,73 @@ def compose(req: ComposeRequest):
     return ComposeResponse(data=_compose(req))
 
 # ------------------------ Универсальный /qr (как было) ------------------------
-def _build_png(data: str, size: int, margin: int, fill: str, back: str) -> bytes:
-    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_Q, box_size=10, border=margin)
-    qr.add_data(data); qr.make(fit=True)
-    img = qr.make_image(fill_color=fill, back_color=back).convert("RGB").resize((size, size))
-    buf = BytesIO(); img.save(buf, format="PNG")
-    return buf.getvalue()
-
-def _build_svg(data: str, margin: int) -> bytes:
-    factory = qrcode.image.svg.SvgImage
-    img = qrcode.make(data, image_factory=factory, border=margin)
-    buf = BytesIO(); img.save(buf)
-    return buf.getvalue()
-
-def _respond(request: Request, *, data: str, fmt: str, size: int, margin: int,
-             fill: str, back: str, download: int, filename: str):
-    key = f"{data}|{fmt}|{size}|{margin}|{fill}|{back}"
-    etag = hashlib.sha256(key.encode("utf-8")).hexdigest()
-    if request.headers.get("If-None-Match") == etag:
-        return Response(status_code=304)
-    if fmt == "svg":
-        content, media, ext = _build_svg(data, margin), "image/svg+xml", "svg"
-    else:
-        content, media, ext = _build_png(data, size, margin, fill, back), "image/png", "png"
+async def _serve(request: Request, *, endpoint: str, fmt: str, etag: str, media: str, headers: dict,
+                 render, last_modified: int = STARTED_AT):
+    """Общий путь рендер-эндпоинтов: метрики, 304/HEAD до рендера, кэш, ответ."""
+    with track(endpoint, fmt) as rec:
+        # 304 и HEAD отвечаем до рендера
+        early = precheck(request, etag=etag, headers=headers, media_type=media,
+                         last_modified=last_modified, length=RENDER_CACHE.length(etag))
+        if early is not None:
+            rec.status = early.status_code
+            return early
+        if await request.is_disconnected():
+            # клиент ушёл (превью отменено новым вводом) — не рендерим впустую
+            rec.status = 499
+            return Response(status_code=499)
+        # под допуск идут только настоящие рендеры: попадания в кэш его не касаются
+        content = await RENDER_CACHE.aget_or_render(etag, lambda: ADMISSION.run(request, render))
+        rec.nbytes = len(content)
+    return Response(content=content, media_type=media, headers=headers)
+
+def _headers(etag: str, disposition: str = None, last_modified: int = STARTED_AT) -> dict:
     headers = {
         "ETag": etag,
         "Cache-Control": "public, max-age=31536000, immutable",
-        "Content-Disposition": f'{"attachment" if download else "inline"}; filename="{filename}.{ext}"',
+        "Last-Modified": http_date(last_modified),
     }
-    return Response(content=content, media_type=media, headers=headers)
+    if disposition:
+        headers["Content-Disposition"] = disposition
+    return headers
+
+async def _respond(request: Request, *, data: str, fmt: str, size: int, margin: int,
+             fill: str, back: str, download: int, filename: str, profile: str = "default"):
+    if profile not in ENCODE_PROFILES:
+        raise HTTPException(422, f"Unknown profile: {profile}")
+    for name, color in (("fill_color", fill), ("back_color", back)):
+        if not valid_color(color, fmt):
+            raise HTTPException(422, f"Invalid {name}: {color}")
+    key = f"{data}|{fmt}|{size}|{margin}|{fill}|{back}"
+    if fmt == "svg":
+        key += f"|{SVG_RENDER_VERSION}"
+    else:
+        key += f"|{PNG_RENDER_VERSION}" + (f"|{profile}" if profile != "default" else "")
+    etag = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    media, ext = ("image/svg+xml", "svg") if fmt == "svg" else profile_media(profile)
+    headers = _headers(etag, f'{"attachment" if download else "inline"}; filename="{filename}.{ext}"')
+    if fmt == "svg":
+        render = lambda: RENDER_POOL.render("svg", data, margin, fill, back)
+    else:
+        render = lambda: RENDER_POOL.render("png", data, size, margin, fill, back, profile)
+    return await _serve(request, endpoint="qr", fmt=fmt, etag=etag, media=media, headers=headers, render=render)
 
-@app.get("/qr")
-def qr_get(
+async def _respond_fixed(request: Request, *, data: str, fmt: str, download: int, filename: str,
+                         profile: str = "default"):
+    # фирменный стиль (как /qr/vcard) для любой строки; размер/поля/цвета — из QR_* настроек
+    if profile not in ENCODE_PROFILES or profile in PLAIN_ONLY_PROFILES:
+        raise HTTPException(422, f"Profile not available for fixed style: {profile}")
+    etag = hashlib.sha256(f"{data}|fixed|{fmt}|{profile}|{style_signature()}".encode("utf-8")).hexdigest()
+    media, ext = ("image/svg+xml", "svg") if fmt == "svg" else profile_media(profile)
+    headers = _headers(etag, f'{"attachment" if download else "inline"}; filename="{filename}.{ext}"', style_mtime())
+    if fmt == "svg":
+        render = lambda: RENDER_POOL.render("fixed_svg", data)
+    else:
+        render = lambda: RENDER_POOL.render("fixed", data, profile)
+    return await _serve(request, endpoint="qr_fixed", fmt=fmt, etag=etag, media=media, headers=headers,
+                        render=render, last_modified=style_mtime())
+
+@app.api_route("/qr", methods=["GET", "HEAD"])
+async def qr_get(
     request: Request,
     data: str = Query(..., description="Готовая строка для кодирования"),
     format: str = Query("png", pattern="^(png|svg)$"),
@@ -166,11 +321,13 @@ def qr_get(
     filename: str = Query("qr"),
     fill_color: str = Query("black"),
     back_color: str = Query("white"),
+    profile: str = Query("default", pattern=PROFILE_PATTERN),
 ):
     if len(data) > 4000:
         raise HTTPException(413, "Слишком длинно для GET; используй POST /qr")
-    return _respond(request, data=data, fmt=format, size=size, margin=margin,
-                    fill=fill_color, back=back_color, download=download, filename=filename)
+    return await _respond(request, data=data, fmt=format, size=size, margin=margin,
+                    fill=fill_color, back=back_color, download=download, filename=filename,
+                    profile=profile)
 
 class QrBody(BaseModel):
     data: str
@@ -181,12 +338,88 @@ class QrBody(BaseModel):
     filename: str = "qr"
     fill_color: str = "black"
     back_color: str = "white"
+    profile: str = "default"
 
 @app.post("/qr")
-def qr_post(request: Request, body: QrBody):
-    return _respond(request, data=body.data, fmt=body.format, size=body.size, margin=body.margin,
+async def qr_post(request: Request, body: QrBody):
+    return await _respond(request, data=body.data, fmt=body.format, size=body.size, margin=body.margin,
                     fill=body.fill_color, back=body.back_color,
-                    download=body.download, filename=body.filename)
+                    download=body.download, filename=body.filename, profile=body.profile)
+
+# ------------------------ Compose + QR за один запрос ------------------------
+class QrComposeBody(ComposeRequest):
+    format: str = Field("png", pattern="^(png|svg)$")
+    size: int = Field(512, ge=64, le=2048)
+    margin: int = Field(2, ge=0, le=8)
+    download: int = Field(0, ge=0, le=1)
+    filename: str = "qr"
+    fill_color: str = "black"
+    back_color: str = "white"
+    profile: str = Field("default", pattern=PROFILE_PATTERN)
+    style: str = Field("plain", pattern="^(plain|fixed)$")
+
+@app.post("/qr/compose")
+async def qr_compose(request: Request, body: QrComposeBody):
+    # ETag — от собранной строки, как у /qr: поля нормализуются в _compose, кэш общий с /qr
+    data = _compose(body)
+    if body.style == "fixed":
+        return await _respond_fixed(request, data=data, fmt=body.format, download=body.download,
+                                    filename=body.filename, profile=body.profile)
+    return await _respond(request, data=data, fmt=body.format, size=body.size, margin=body.margin,
+                          fill=body.fill_color, back=body.back_color,
+                          download=body.download, filename=body.filename, profile=body.profile)
+
+# ------------------------ Матрица для отрисовки в браузере ------------------------
+async def _respond_matrix(request: Request, *, data: str, fmt: str, style: str, encoding: str):
+    key = f"matrix|{data}|{EC_NAMES[matrix_ec(fmt, style)]}|{style}|{encoding}"
+    last_modified = STARTED_AT
+    if style == "fixed":
+        key += f"|{style_signature()}"
+        last_modified = style_mtime()
+    etag = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    media = "application/octet-stream" if encoding == "binary" else "application/json"
+    return await _serve(request, endpoint="matrix", fmt=encoding, etag=etag, media=media,
+                        headers=_headers(etag, last_modified=last_modified), last_modified=last_modified,
+                        render=lambda: RENDER_POOL.render("matrix", data, fmt, style, encoding))
+
+@app.api_route("/qr/matrix", methods=["GET", "HEAD"])
+async def qr_matrix_get(
+    request: Request,
+    data: str = Query(..., description="Готовая строка для кодирования"),
+    format: str = Query("png", pattern="^(png|svg)$", description="Под какой формат: уровень EC как у /qr"),
+    style: str = Query("plain", pattern="^(plain|fixed)$", description="fixed — стиль /qr/vcard: цвета, лого"),
+    encoding: str = Query("json", pattern="^(json|binary)$"),
+):
+    """
+    Матрица модулей вместо картинки — браузер рисует QR сам.
+    json: {version, ec, size, finders, bits (base64), style}; binary: 5 байт заголовка
+    (b"QR", версия, EC, сторона) + биты. Биты построчно, 1 — тёмный модуль, старший бит первый.
+    """
+    if len(data) > 4000:
+        raise HTTPException(413, "Слишком длинно для GET; используй POST /qr/matrix")
+    return await _respond_matrix(request, data=data, fmt=format, style=style, encoding=encoding)
+
+class QrMatrixBody(ComposeRequest):
+    format: str = Field("png", pattern="^(png|svg)$")
+    style: str = Field("plain", pattern="^(plain|fixed)$")
+    encoding: str = Field("json", pattern="^(json|binary)$")
+
+@app.post("/qr/matrix")
+async def qr_matrix_post(request: Request, body: QrMatrixBody):
+    return await _respond_matrix(request, data=_compose(body), fmt=body.format, style=body.style,
+                                 encoding=body.encoding)
+
+@app.api_route("/qr/logo", methods=["GET", "HEAD"])
+async def qr_logo(request: Request):
+    """Слой лого с подложкой (PNG с альфой) под сторону QR_SIZE — для отрисовки фирменного стиля в браузере."""
+    etag = hashlib.sha256(f"logo|{style_signature()}".encode("utf-8")).hexdigest()
+    png = logo_png(QR_FIXED_SIZE)
+    if png is None:
+        raise HTTPException(404, "Лого не настроено")
+    headers = _headers(etag, last_modified=style_mtime())
+    early = precheck(request, etag=etag, headers=headers, media_type="image/png",
+                     last_modified=style_mtime(), length=len(png))
+    return early or Response(content=png, media_type="image/png", headers=headers)
 
 # ------------------------ ЛК vCard ------------------------
 app.include_router(vcard_router)
@@ -0,0 +1,202 @@
+# metrics.py
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# ===== профилирование медленных рендеров (выключено, пока QR_PROFILE_SLOW_MS=0) =====
+QR_PROFILE_SLOW_MS = float(os.getenv("QR_PROFILE_SLOW_MS", "0"))
+QR_PROFILE_SAMPLE = float(os.getenv("QR_PROFILE_SAMPLE", "0.01"))       # доля запросов под cProfile
+QR_PROFILE_DIR = os.getenv("QR_PROFILE_DIR", "/tmp/qr-profiles")
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series: Dict[tuple, list] = {}     # labels -> [counts по бакетам..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, s in series:
+            base = _labels(self.labels, label_values)
+            acc = 0
+            for le, n in zip(self.buckets + ("+Inf",), s[:-1]):
+                acc += n
+                yield f'{self.name}_bucket{{{base}{"," if base else ""}le="{le}"}} {acc}'
+            yield f"{self.name}_sum{{{base}}} {s[-1]:.6f}"
+            yield f"{self.name}_count{{{base}}} {acc}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: int = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, v in items:
+            yield f"{self.name}{{{_labels(self.labels, label_values)}}} {v}"
+
+
+def _labels(names, values) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in zip(names, values))
+
+
+def gauge(name: str, help_text: str, value, labels: str = "", kind: str = "gauge"):
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} {kind}"
+    yield f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+
+
+def counter(name: str, help_text: str, value, labels: str = ""):
+    # счётчик, который ведёт сам объект (кэш): только растёт, rate() по нему корректен
+    return gauge(f"{name}_total", help_text, value, labels, kind="counter")
+
+
+REQUESTS = Counter("qr_requests_total", "Ответы рендер-эндпоинтов по статусу", ("endpoint", "format", "status"))
+REQUEST_SECONDS = Histogram("qr_request_seconds", "Время обработчика целиком", ("endpoint", "format"), SECONDS_BUCKETS)
+STAGE_SECONDS = Histogram("qr_stage_seconds", "Время стадий рендера",
+                          ("endpoint", "format", "version", "stage"), SECONDS_BUCKETS)
+RESPONSE_BYTES = Histogram("qr_response_bytes", "Размер тела ответа", ("endpoint", "format"), BYTES_BUCKETS)
+PROFILES_DUMPED = Counter("qr_profiles_dumped_total", "Сохранённые cProfile медленных рендеров", ("endpoint",))
+
+
+# ===== стадии: рендер пишет в рекордер текущего запроса (через contextvar, доходит и до тредпула) =====
+class StageRecorder:
+    def __init__(self, endpoint: str = "", fmt: str = ""):
+        self.endpoint, self.format = endpoint, fmt
+        self.stages: Dict[str, float] = {}
+        self.version = "-"
+        self.status = 200
+        self.nbytes: Optional[int] = None
+        self.profile = bool(QR_PROFILE_SLOW_MS) and random.random() < QR_PROFILE_SAMPLE
+
+    def merge(self, stages: Dict[str, float], version) -> None:
+        for k, v in stages.items():
+            self.stages[k] = self.stages.get(k, 0.0) + v
+        if version is not None:
+            self.version = version
+
+
+_current: ContextVar[Optional[StageRecorder]] = ContextVar("qr_stage_recorder", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    rec = _current.get()
+    if rec is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec.stages[name] = rec.stages.get(name, 0.0) + time.perf_counter() - t0
+
+
+def note_version(version: int) -> None:
+    rec = _current.get()
+    if rec is not None:
+        rec.version = version
+
+
+@contextmanager
+def collect():
+    """Рекордер без запроса — для воркеров пула: стадии уходят в родителя вместе с картинкой."""
+    rec = StageRecorder()
+    token = _current.set(rec)
+    try:
+        yield rec
+    finally:
+        _current.reset(token)
+
+
+def current_recorder() -> Optional[StageRecorder]:
+    return _current.get()
+
+
+def merge_stages(stages: Dict[str, float], version) -> None:
+    rec = _current.get()
+    if rec is not None:
+        rec.merge(stages, version)
+
+
+@contextmanager
+def track(endpoint: str, fmt: str):
+    rec = StageRecorder(endpoint, fmt)
+    token = _current.set(rec)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec.status = getattr(e, "status_code", 500)
+        raise
+    finally:
+        _current.reset(token)
+        REQUESTS.inc(endpoint, fmt, rec.status)
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint, fmt)
+        for name, seconds in rec.stages.items():
+            STAGE_SECONDS.observe(seconds, endpoint, fmt, rec.version, name)
+        if rec.nbytes is not None:
+            RESPONSE_BYTES.observe(rec.nbytes, endpoint, fmt)
+
+
+def profiled(fn, *args):
+    """Выполнить fn под cProfile, если запрос попал в выборку; дамп — только если рендер медленнее порога."""
+    rec = _current.get()
+    if rec is None or not rec.profile:
+        return fn(*args)
+    prof = cProfile.Profile()
+    t0 = time.perf_counter()
+    try:
+        prof.enable()
+    except ValueError:          # в этом треде уже работает другой профайлер
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        prof.disable()
+        ms = (time.perf_counter() - t0) * 1000
+        if ms >= QR_PROFILE_SLOW_MS:
+            os.makedirs(QR_PROFILE_DIR, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{rec.endpoint or 'render'}-{int(ms)}ms-{os.getpid()}.prof"
+            prof.dump_stats(os.path.join(QR_PROFILE_DIR, name))
+            PROFILES_DUMPED.inc(rec.endpoint or "render")
+
+
+def render_prometheus(extra=()) -> str:
+    lines = []
+    for metric in (REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, RESPONSE_BYTES, PROFILES_DUMPED):
+        lines.extend(metric.render())
+    for chunk in extra:
+        lines.extend(chunk)
+    return "\n".join(lines) + "\n"
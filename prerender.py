@@ -0,0 +1,147 @@
+"""
+Предрендер фирменных vCard-QR по выгрузке справочника в хранилище на диске.
+
+    python -m prerender employees.csv --out /srv/qr-store            # iOS и Android, PNG
+    python -m prerender employees.json --out /srv/qr-store --format png svg --workers 4 --prune
+
+Файл кладётся по ETag того же ключа, что у /qr/vcard: <out>/<etag[:2]>/<etag>.<ext>.
+Ключ включает vCard и подпись стиля, поэтому повторный прогон рендерит только изменившиеся записи.
+Сервис отдаёт попадания прямо с диска, если задан QR_PRERENDER_DIR.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+QR_PRERENDER_DIR = os.getenv("QR_PRERENDER_DIR", "")      # пусто — хранилище не используется
+
+STORE_FORMATS = {"png": ("fixed", "png"), "svg": ("fixed_svg", "svg")}
+OS_PROFILES = ("ios", "android")
+
+
+class PrerenderStore:
+    """Контент-адресуемое хранилище готовых картинок: имя файла — ETag."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, etag: str, ext: str) -> str:
+        return os.path.join(self.root, etag[:2], f"{etag}.{ext}")
+
+    def lookup(self, etag: str, ext: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.path(etag, ext))
+        except OSError:
+            return None
+
+    def read(self, etag: str, ext: str) -> Optional[bytes]:
+        try:
+            with open(self.path(etag, ext), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, etag: str, ext: str, content: bytes) -> None:
+        # через временный файл и rename: сервис никогда не увидит недописанную картинку
+        path = self.path(etag, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def files(self):
+        for sub in os.scandir(self.root):
+            if sub.is_dir() and len(sub.name) == 2:
+                for entry in os.scandir(sub.path):
+                    if not entry.name.endswith(".tmp"):
+                        yield entry.path
+
+
+PRERENDER_STORE = PrerenderStore(QR_PRERENDER_DIR) if QR_PRERENDER_DIR else None
+
+
+def _read_rows(path: str):
+    from vcard_portal import _parse_batch_rows
+    with open(path, "rb") as f:
+        body = f.read()
+    ctype = "application/json" if path.lower().endswith(".json") else "text/csv"
+    return _parse_batch_rows(body, ctype)
+
+
+def plan(rows, os_profiles, formats):
+    """(etag, ext, kind, vcard) на каждую строку x профиль x формат — ровно как посчитает /qr/vcard."""
+    from qr_core import fixed_etag
+    from vcard_portal import BATCH_FIELDS, _build_vcard, _normalize_batch_row, _vcard_etag_key
+    for i, row in enumerate(rows):
+        f = _normalize_batch_row(i, row, "ios")
+        for os_profile in os_profiles:
+            vcard = _build_vcard(os_profile, *(f[k] for k in BATCH_FIELDS))
+            for fmt in formats:
+                kind, ext = STORE_FORMATS[fmt]
+                yield fixed_etag(_vcard_etag_key(vcard, os_profile, fmt)), ext, kind, vcard
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m prerender", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("source", help="выгрузка справочника: .csv (, или ;) или .json")
+    ap.add_argument("--out", default=QR_PRERENDER_DIR, help="каталог хранилища (по умолчанию QR_PRERENDER_DIR)")
+    ap.add_argument("--os", nargs="+", default=list(OS_PROFILES), choices=OS_PROFILES)
+    ap.add_argument("--format", nargs="+", default=["png"], choices=list(STORE_FORMATS))
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="процессы рендера (0 — в этом процессе)")
+    ap.add_argument("--prune", action="store_true",
+                    help="удалить файлы форматов из --format, которых нет в текущей выгрузке/стиле")
+    args = ap.parse_args(argv)
+    if not args.out:
+        ap.error("нужен --out или QR_PRERENDER_DIR")
+
+    from fastapi import HTTPException
+    from render_pool import RenderPool
+    try:
+        rows = _read_rows(args.source)
+        jobs = {etag: (ext, kind, vcard) for etag, ext, kind, vcard in plan(rows, args.os, args.format)}
+    except HTTPException as e:
+        print(f"ошибка в выгрузке: {e.detail}", file=sys.stderr)
+        return 2
+
+    store = PrerenderStore(args.out)
+    todo = [(etag, ext, kind, vcard) for etag, (ext, kind, vcard) in jobs.items() if store.lookup(etag, ext) is None]
+
+    pool = RenderPool(args.workers)
+    pool.start()
+    t0 = time.perf_counter()
+    try:
+        def render(job):
+            etag, ext, kind, vcard = job
+            store.write(etag, ext, pool.render_sync(kind, vcard))
+
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+            for _ in ex.map(render, todo):
+                pass
+    finally:
+        pool.shutdown()
+
+    pruned = 0
+    if args.prune:
+        # только перерендеренные форматы; профиль ОС по имени файла (ETag) не различить —
+        # актуальные файлы строк под любую ОС остаются, даже если в этот раз её не рендерили
+        exts = {"." + STORE_FORMATS[fmt][1] for fmt in args.format}
+        keep = {store.path(etag, ext) for etag, ext, _, _ in plan(rows, OS_PROFILES, args.format)}
+        for path in store.files():
+            if os.path.splitext(path)[1] in exts and path not in keep:
+                os.unlink(path)
+                pruned += 1
+    print(f"записей: {len(jobs)}, отрендерено: {len(todo)}, уже были: {len(jobs) - len(todo)}, "
+          f"удалено: {pruned}, {time.perf_counter() - t0:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
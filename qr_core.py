@@ -1,11 +1,21 @@
-import os, hashlib, unicodedata, re, urllib.parse
+from __future__ import annotations
+
+import os, hashlib, unicodedata, re, urllib.parse, threading, time, base64, json, struct, logging
+from functools import lru_cache
 from io import BytesIO
-from typing import Tuple
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from conditional import STARTED_AT, http_date
+from metrics import note_version, stage
 
-import qrcode
-from qrcode.constants import ERROR_CORRECT_Q, ERROR_CORRECT_H
-from PIL import Image, ImageDraw
-from fastapi import Request, Response
+# numpy, PIL и qrcode (с qr_encoder) импортируются внутри функций, при первом рендере или прогреве:
+# на холодном старте /healthz отвечает, не дожидаясь их
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+# значения qrcode.constants: сам пакет qrcode при импорте тянет PIL, а уровни нужны уже здесь
+ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H = 0, 3, 2
 
 # ===== стиль/дефолты (под Android и презентации) =====
 QR_FIXED_SIZE = int(os.getenv("QR_SIZE", "768"))                     # побольше по умолчанию
@@ -18,8 +28,17 @@ QR_FIXED_LOGO_PATH = os.getenv("QR_LOGO", "assets/logo.png")
 QR_FIXED_LOGO_RATIO = float(os.getenv("QR_LOGO_RATIO", "0.34"))      # аккуратный размер лого
 QR_FIXED_LOGO_PAD = float(os.getenv("QR_LOGO_PAD", "0.5"))          # тонкая подложка
 QR_FIXED_LOGO_PAD_RADIUS = int(os.getenv("QR_LOGO_PAD_RADIUS", "12"))
+QR_LOGO_CHECK_INTERVAL = float(os.getenv("QR_LOGO_CHECK_INTERVAL", "2"))  # как часто смотреть на файл лого, сек
 
 QR_FIXED_ECLEVEL = ERROR_CORRECT_H if os.getenv("QR_EC", "H").upper() == "H" else ERROR_CORRECT_Q
+# закрепить версию (минимальную, растёт только если данные не влезли) и маску — без подбора; пусто — как раньше
+QR_FIXED_VERSION = int(os.getenv("QR_VERSION", "0")) or None
+QR_FIXED_MASK = int(os.getenv("QR_MASK")) if os.getenv("QR_MASK", "") != "" else None
+# иначе ошибка всплыла бы только на первом /qr/vcard (500 из qrcode), а /qr продолжал бы работать
+if QR_FIXED_VERSION is not None and not 1 <= QR_FIXED_VERSION <= 40:
+    raise ValueError(f"QR_VERSION={QR_FIXED_VERSION}: нужна версия 1..40 (0 или пусто — подбор)")
+if QR_FIXED_MASK is not None and not 0 <= QR_FIXED_MASK <= 7:
+    raise ValueError(f"QR_MASK={QR_FIXED_MASK}: нужна маска 0..7 (пусто — подбор)")
 
 def _file_hash(path: str) -> str:
     try:
@@ -28,20 +47,36 @@ def _file_hash(path: str) -> str:
     except Exception:
         return "no-logo"
 
-QR_FIXED_LOGO_HASH = _file_hash(QR_FIXED_LOGO_PATH)
-
-STYLE_SIGNATURE = "|".join([
-    f"size={QR_FIXED_SIZE}",
-    f"border={QR_FIXED_BORDER}",
-    f"fill={QR_FIXED_FILL}",
-    f"bg={QR_FIXED_BG}",
-    f"finder={QR_FIXED_FINDER}",
-    f"logo={QR_FIXED_LOGO_PATH}",
-    f"logo_hash={QR_FIXED_LOGO_HASH}",
-    f"logo_ratio={QR_FIXED_LOGO_RATIO}",
-    f"logo_pad={QR_FIXED_LOGO_PAD}",
-    f"ec={'H' if QR_FIXED_ECLEVEL == ERROR_CORRECT_H else 'Q'}",
-])
+def _file_stat(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _style_signature(logo_hash: str) -> str:
+    parts = [
+        f"size={QR_FIXED_SIZE}",
+        f"border={QR_FIXED_BORDER}",
+        f"fill={QR_FIXED_FILL}",
+        f"bg={QR_FIXED_BG}",
+        f"finder={QR_FIXED_FINDER}",
+        f"logo={QR_FIXED_LOGO_PATH}",
+        f"logo_hash={logo_hash}",
+        f"logo_ratio={QR_FIXED_LOGO_RATIO}",
+        f"logo_pad={QR_FIXED_LOGO_PAD}",
+        f"ec={'H' if QR_FIXED_ECLEVEL == ERROR_CORRECT_H else 'Q'}",
+    ]
+    # закреплённые версия/маска меняют картинку — но без них подпись (и ETag) прежняя
+    if QR_FIXED_VERSION:
+        parts.append(f"version={QR_FIXED_VERSION}")
+    if QR_FIXED_MASK is not None:
+        parts.append(f"mask={QR_FIXED_MASK}")
+    return "|".join(parts)
+
+# лого хэшируется при первом style_signature() (прогрев или первый запрос), а не при импорте
+QR_FIXED_LOGO_HASH: Optional[str] = None
+STYLE_SIGNATURE: Optional[str] = None
 
 # ===== filename/content-disposition =====
 def _safe_ascii_filename(name: str, default: str = "vcard_qr") -> str:
@@ -49,60 +84,228 @@ def _safe_ascii_filename(name: str, default: str = "vcard_qr") -> str:
     base = re.sub(r"[^A-Za-z0-9._-]+", "_", base).strip("._-")
     return base or default
 
-def respond_fixed_png(request: Request, *, data_key: str, content: bytes, filename: str):
-    etag = hashlib.sha256(data_key.encode("utf-8")).hexdigest()
-    if request.headers.get("If-None-Match") == etag:
-        return Response(status_code=304)
-    ascii_name = _safe_ascii_filename(filename, "vcard_qr") + ".png"
-    utf8_name = urllib.parse.quote((filename or "vcard_qr") + ".png", safe="")
-    headers = {
+def fixed_etag(data_key: str) -> str:
+    return hashlib.sha256(data_key.encode("utf-8")).hexdigest()
+
+def fixed_headers(filename: str, ext: str, etag: str, last_modified: int) -> dict:
+    ascii_name = _safe_ascii_filename(filename, "vcard_qr") + "." + ext
+    utf8_name = urllib.parse.quote((filename or "vcard_qr") + "." + ext, safe="")
+    return {
         "ETag": etag,
         "Cache-Control": "public, max-age=31536000, immutable",
+        "Last-Modified": http_date(last_modified),
         "Content-Disposition": f'inline; filename="{ascii_name}"; filename*=UTF-8\'\'{utf8_name}',
     }
-    return Response(content=content, media_type="image/png", headers=headers)
 
-# ===== рендер: модульность, ровные ключи, лого =====
-def _compute_box_and_modules(data: str, margin_modules: int) -> Tuple[Image.Image, int, int, Tuple[int, int]]:
-    qr_tmp = qrcode.QRCode(version=None, error_correction=QR_FIXED_ECLEVEL, box_size=1, border=margin_modules)
-    qr_tmp.add_data(data); qr_tmp.make(fit=True)
-    modules = qr_tmp.modules_count
-    total_modules = modules + margin_modules * 2
-    box_size = max(1, QR_FIXED_SIZE // total_modules)
+# ===== матрица модулей: кодируем один раз, дальше всё считаем от неё =====
+QR_MATRIX_CACHE_SIZE = int(os.getenv("QR_MATRIX_CACHE_SIZE", "512"))
 
-    qr = qrcode.QRCode(version=None, error_correction=QR_FIXED_ECLEVEL, box_size=box_size, border=margin_modules)
+class QRMatrix(NamedTuple):
+    version: int
+    ec: int
+    size: int      # модулей по стороне, без тихой зоны
+    bits: bytes    # size*size байт построчно: 1 — тёмный модуль
+
+    @property
+    def array(self) -> np.ndarray:
+        import numpy as np
+        # read-only view без копии
+        return np.frombuffer(self.bits, dtype=np.uint8).reshape(self.size, self.size)
+
+def finder_origins(modules: int) -> List[Tuple[int, int]]:
+    return [(0, 0), (modules - 7, 0), (0, modules - 7)]
+
+@lru_cache(maxsize=QR_MATRIX_CACHE_SIZE)
+def encode_matrix(data: str, ec: int, version: Optional[int] = None, mask: Optional[int] = None) -> QRMatrix:
+    # подбор версии и маски — самое дорогое место, делаем его ровно один раз на (data, ec);
+    # маска выбирается векторно (FastMaskQRCode), с закреплённой mask подбора нет вовсе
+    import numpy as np
+    from qr_encoder import FastMaskQRCode
+    qr = FastMaskQRCode(version=version, error_correction=ec, box_size=1, border=0, mask_pattern=mask)
     qr.add_data(data); qr.make(fit=True)
-    img = qr.make_image(fill_color=QR_FIXED_FILL, back_color=QR_FIXED_BG).convert("RGBA")
-
-    offset = (0, 0)
-    if img.size[0] != QR_FIXED_SIZE:
-        canvas = Image.new("RGBA", (QR_FIXED_SIZE, QR_FIXED_SIZE), QR_FIXED_BG)
-        offset = ((QR_FIXED_SIZE - img.size[0]) // 2, (QR_FIXED_SIZE - img.size[1]) // 2)
-        canvas.paste(img, offset)
-        img = canvas
-    return img, box_size, modules, offset
-
-def _recolor_finders_precise(img: Image.Image, box: int, margin: int, modules: int, color: str, bg: str, offset=(0, 0)):
-    draw = ImageDraw.Draw(img)
-    offx, offy = offset
-    def rect(mod_x, mod_y, w_mods, h_mods, fill):
-        x0 = offx + (margin + mod_x) * box
-        y0 = offy + (margin + mod_y) * box
-        x1 = x0 + w_mods * box - 1
-        y1 = y0 + h_mods * box - 1
-        draw.rectangle([x0, y0, x1, y1], fill=fill)
-    for mod_x, mod_y in [(0,0), (modules-7,0), (0,modules-7)]:
-        rect(mod_x,     mod_y,     7, 7, color)
-        rect(mod_x + 1, mod_y + 1, 5, 5, QR_FIXED_BG)
-        rect(mod_x + 2, mod_y + 2, 3, 3, color)
-
-def _paste_logo_with_pad(img: Image.Image, logo_path: str, ratio: float,
-                         pad_scale: float, pad_radius: int, pad_color: str) -> Image.Image:
+    bits = np.array(qr.modules, dtype=np.uint8).tobytes()
+    return QRMatrix(qr.version, ec, qr.modules_count, bits)
+
+# ===== растеризация: матрица -> индексы палитры -> пиксели, без PIL-рисования =====
+# индексы палитры: 0 — фон, 1 — модуль, 2 — угловой ключ
+
+def valid_color(color: str, fmt: str = "png") -> bool:
+    """Цвет, который поймут palette() (PNG) и _svg_color() (SVG — ещё none/transparent)."""
+    from PIL import ImageColor
+    if fmt == "svg" and color.lower() in ("none", "transparent"):
+        return True
+    try:
+        ImageColor.getrgb(color)
+    except ValueError:
+        return False
+    return True
+
+def palette(*colors: str) -> bytes:
+    from PIL import ImageColor
+    return b"".join(bytes(ImageColor.getrgb(c)[:3]) for c in colors)
+
+@lru_cache(maxsize=64)
+def _finder_mask(modules: int) -> np.ndarray:
+    import numpy as np
+    mask = np.zeros((modules, modules), dtype=np.uint8)
+    for mod_x, mod_y in finder_origins(modules):
+        mask[mod_y:mod_y + 7, mod_x:mod_x + 7] = 1
+    mask.setflags(write=False)
+    return mask
+
+def module_indices(matrix: QRMatrix, finders: bool = False) -> np.ndarray:
+    arr = matrix.array
+    if not finders:
+        return arr
+    # тёмные модули внутри ключей получают индекс 2, светлые остаются фоном
+    return arr + (arr & _finder_mask(matrix.size))
+
+def rasterize(indices: np.ndarray, margin_modules: int, target: int) -> np.ndarray:
+    """Матрица индексов -> холст target×target: целое увеличение модулей, остаток поровну по краям."""
+    import numpy as np
+    n = indices.shape[0]
+    total = n + margin_modules * 2
+    box = target // total
+    if box == 0:
+        # модулей больше, чем пикселей: берём ближайший модуль
+        grid = np.zeros((total, total), dtype=np.uint8)
+        grid[margin_modules:margin_modules + n, margin_modules:margin_modules + n] = indices
+        axis = np.arange(target) * total // target
+        return grid[axis[:, None], axis[None, :]]
+    canvas = np.zeros((target, target), dtype=np.uint8)
+    o = (target - total * box) // 2 + margin_modules * box
+    side = n * box
+    rows = np.repeat(indices, box, axis=1)
+    canvas[o:o + side, o:o + side].reshape(n, box, side)[...] = rows[:, None, :]
+    return canvas
+
+def indexed_image(canvas: np.ndarray, colors: bytes) -> Image.Image:
+    from PIL import Image
+    h, w = canvas.shape
+    img = Image.frombuffer("P", (w, h), canvas, "raw", "P", 0, 1)
+    img.putpalette(colors)
+    return img
+
+# ===== профили кодирования картинки =====
+# default — как было (24-битный PNG, zlib 6); palette — индексированный PNG, для двух цветов PIL сам пишет 1 бит;
+# fast/small — уровни zlib под латентность и под долгоживущий кэш; webp — WebP без потерь
+ENCODE_PROFILES = {
+    "default": {"media": "image/png",  "ext": "png",  "save": {"format": "PNG"}},
+    "fast":    {"media": "image/png",  "ext": "png",  "save": {"format": "PNG", "compress_level": 1}},
+    "small":   {"media": "image/png",  "ext": "png",  "save": {"format": "PNG", "compress_level": 9}},
+    "palette": {"media": "image/png",  "ext": "png",  "save": {"format": "PNG", "compress_level": 9}},
+    "webp":    {"media": "image/webp", "ext": "webp", "save": {"format": "WEBP", "lossless": True, "method": 4}},
+}
+PLAIN_ONLY_PROFILES = ("palette",)      # нужен чистый QR без лого — у него всего 2–3 цвета
+# pattern для Query/Field и быстрого пути — список профилей задаётся только выше
+PROFILE_PATTERN = "^(" + "|".join(ENCODE_PROFILES) + ")$"
+FIXED_PROFILE_PATTERN = "^(" + "|".join(p for p in ENCODE_PROFILES if p not in PLAIN_ONLY_PROFILES) + ")$"
+
+def profile_media(profile: str) -> Tuple[str, str]:
+    p = ENCODE_PROFILES[profile]
+    return p["media"], p["ext"]
+
+def encode_image(img: Image.Image, profile: str = "default") -> bytes:
+    if profile not in PLAIN_ONLY_PROFILES and img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = BytesIO(); img.save(buf, **ENCODE_PROFILES[profile]["save"])
+    return buf.getvalue()
+
+# ===== универсальный /qr: PNG и SVG =====
+def _encode(data: str, ec: int, version: Optional[int] = None, mask: Optional[int] = None) -> QRMatrix:
+    with stage("encode"):
+        matrix = encode_matrix(data, ec, version, mask)
+    note_version(matrix.version)
+    return matrix
+
+def build_png(data: str, size: int, margin: int, fill: str, back: str, profile: str = "default") -> bytes:
+    matrix = _encode(data, ERROR_CORRECT_Q)
+    with stage("raster"):
+        img = indexed_image(rasterize(module_indices(matrix), margin, size), palette(back, fill))
+    with stage("image_encode"):
+        return encode_image(img, profile)
+
+# версии рендереров в ETag /qr: байты поменялись — меняется ключ, иначе старые immutable-копии
+# под прежним ETag жили бы у браузеров и CDN ещё год.
+# png2 — целые блоки модулей с полями поровну вместо рендера 10px + bicubic;
+# svg2 — один <path> на цвет, фон, fill/back применяются
+PNG_RENDER_VERSION = "png2"
+SVG_RENDER_VERSION = "svg2"
+
+def build_svg(data: str, margin: int, fill: str = "black", back: str = "white") -> bytes:
+    # уровень M — как было у qrcode.make(), чтобы версия и плотность SVG не поменялись
+    matrix = _encode(data, ERROR_CORRECT_M)
+    with stage("svg_write"):
+        return svg_document(matrix, margin, fill, back)
+
+# ===== SVG: один <path> на цвет, соседние модули строки слиты в один отрезок =====
+def _svg_color(color: str) -> str:
+    from PIL import ImageColor
+    if color.lower() in ("none", "transparent"):
+        return "none"
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+def _svg_runs(mask: np.ndarray, margin: int) -> str:
+    """Горизонтальные серии единиц -> 'M x y h w v1 h-w z' (в модулях, с учётом тихой зоны)."""
+    import numpy as np
+    n = mask.shape[1]
+    padded = np.zeros((mask.shape[0], n + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    d = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    return "".join(f"M{x + margin} {y + margin}h{w}v1h-{w}z"
+                   for y, x, w in zip(rows.tolist(), starts.tolist(), (ends - starts).tolist()))
+
+def svg_document(matrix: QRMatrix, margin: int, fill: str, back: str,
+                 finder: str = None, logo_uri: str = None, logo_box=None) -> bytes:
+    total = matrix.size + margin * 2
+    arr = matrix.array
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{total}mm" height="{total}mm" '
+        f'viewBox="0 0 {total} {total}" shape-rendering="crispEdges">',
+    ]
+    back = _svg_color(back)
+    if back != "none":
+        parts.append(f'<rect width="100%" height="100%" fill="{back}"/>')
+    if finder:
+        fmask = arr & _finder_mask(matrix.size)
+        parts.append(f'<path fill="{_svg_color(fill)}" d="{_svg_runs(arr - fmask, margin)}"/>')
+        parts.append(f'<path fill="{_svg_color(finder)}" d="{_svg_runs(fmask, margin)}"/>')
+    else:
+        parts.append(f'<path fill="{_svg_color(fill)}" d="{_svg_runs(arr, margin)}"/>')
+    if logo_uri:
+        x, y, w, h = logo_box
+        parts.append(f'<image x="{x:.3f}" y="{y:.3f}" width="{w:.3f}" height="{h:.3f}" href="{logo_uri}"/>')
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8")
+
+# ===== лого: шаблоны под размер, пересобираются при смене файла =====
+class LogoTemplate(NamedTuple):
+    layer: Image.Image          # RGBA: подложка + лого, накладывается одним alpha-блитом
+    pos: Tuple[int, int]
+
+_logo_lock = threading.Lock()
+_logo_source: Optional[Image.Image] = None     # декодированный assets/logo.png
+_logo_stat = None
+_logo_checked_at = float("-inf")               # первая проверка — всегда, даже если uptime меньше интервала
+_logo_templates: Dict[int, Optional[LogoTemplate]] = {}
+_logo_pngs: Dict[int, bytes] = {}               # тот же слой в PNG — для SVG и /qr/logo
+_logo_uris: Dict[int, str] = {}
+
+def _load_logo_source() -> Optional[Image.Image]:
+    from PIL import Image
     try:
-        logo = Image.open(logo_path).convert("RGBA")
+        with Image.open(QR_FIXED_LOGO_PATH) as im:
+            return im.convert("RGBA")
     except Exception:
-        return img
-    side = min(img.size)
+        return None
+
+def _build_logo_template(logo: Image.Image, side: int, ratio: float,
+                         pad_scale: float, pad_radius: int, pad_color: str) -> LogoTemplate:
+    from PIL import Image, ImageDraw
     target = max(1, int(side * ratio))
     logo = logo.copy(); logo.thumbnail((target, target), Image.LANCZOS)
     lw, lh = logo.size
@@ -110,27 +313,178 @@ def _paste_logo_with_pad(img: Image.Image, logo_path: str, ratio: float,
     if pad_scale and pad_scale != 1.0:
         pad_w = max(1, int(lw * pad_scale))
         pad_h = max(1, int(lh * pad_scale))
-        pad = Image.new("RGBA", (pad_w, pad_h), (0, 0, 0, 0))
-        d = ImageDraw.Draw(pad)
-        d.rounded_rectangle([0, 0, pad_w-1, pad_h-1], radius=pad_radius, fill=pad_color)
-        cx = (img.width - pad_w) // 2
-        cy = (img.height - pad_h) // 2
-        img = img.copy()
-        img.paste(pad, (cx, cy), pad)
+        cx = (side - pad_w) // 2
+        cy = (side - pad_h) // 2
         lx = cx + (pad_w - lw) // 2
         ly = cy + (pad_h - lh) // 2
     else:
-        lx = (img.width - lw) // 2
-        ly = (img.height - lh) // 2
-    img.paste(logo, (lx, ly), logo)
+        pad_w = pad_h = 0
+        cx, cy = lx, ly = (side - lw) // 2, (side - lh) // 2
+
+    # общий прямоугольник подложки и лого — в нём и собираем слой
+    x0, y0 = min(cx, lx), min(cy, ly)
+    x1, y1 = max(cx + pad_w, lx + lw), max(cy + pad_h, ly + lh)
+    layer = Image.new("RGBA", (x1 - x0, y1 - y0), (0, 0, 0, 0))
+    if pad_w:
+        d = ImageDraw.Draw(layer)
+        d.rounded_rectangle([cx - x0, cy - y0, cx - x0 + pad_w - 1, cy - y0 + pad_h - 1],
+                            radius=pad_radius, fill=pad_color)
+    layer.alpha_composite(logo, (lx - x0, ly - y0))
+    return LogoTemplate(layer, (x0, y0))
+
+def style_signature(force: bool = False) -> str:
+    """
+    Раз в QR_LOGO_CHECK_INTERVAL смотрит на файл лого; если хэш поменялся — сбрасывает шаблоны и подпись стиля.
+    force — перечитать хэш сейчас, не глядя на интервал и stat (воркер пула отстал от родителя).
+    """
+    global _logo_source, _logo_stat, _logo_checked_at, QR_FIXED_LOGO_HASH, STYLE_SIGNATURE
+    now = time.monotonic()
+    if not force and now - _logo_checked_at < QR_LOGO_CHECK_INTERVAL:
+        return STYLE_SIGNATURE
+    with _logo_lock:
+        if not force and now - _logo_checked_at < QR_LOGO_CHECK_INTERVAL:
+            return STYLE_SIGNATURE
+        stat = _file_stat(QR_FIXED_LOGO_PATH)
+        if force or stat != _logo_stat or _logo_source is None:
+            _logo_stat = stat
+            logo_hash = _file_hash(QR_FIXED_LOGO_PATH)
+            if logo_hash != QR_FIXED_LOGO_HASH or _logo_source is None:
+                _logo_source = _load_logo_source()
+                _logo_templates.clear()
+                _logo_pngs.clear()
+                _logo_uris.clear()
+                QR_FIXED_LOGO_HASH = logo_hash
+                STYLE_SIGNATURE = _style_signature(logo_hash)
+        # отметка — после подписи: без лока подпись читают, только пока проверка свежая
+        _logo_checked_at = now
+        return STYLE_SIGNATURE
+
+def style_mtime() -> int:
+    """Last-Modified фирменного стиля: старт процесса или правка файла лого, что позже."""
+    mtime = _logo_stat[0] // 1_000_000_000 if _logo_stat else 0
+    return max(STARTED_AT, mtime)
+
+def logo_template(side: int) -> Optional[LogoTemplate]:
+    tpl = _logo_templates.get(side, False)
+    if tpl is not False:
+        return tpl
+    with _logo_lock:
+        if side not in _logo_templates:
+            _logo_templates[side] = None if _logo_source is None else _build_logo_template(
+                _logo_source, side, QR_FIXED_LOGO_RATIO, pad_scale=QR_FIXED_LOGO_PAD,
+                pad_radius=QR_FIXED_LOGO_PAD_RADIUS, pad_color=QR_FIXED_BG)
+        return _logo_templates[side]
+
+def logo_png(side: int) -> Optional[bytes]:
+    png = _logo_pngs.get(side)
+    if png is None:
+        tpl = logo_template(side)
+        if tpl is None:
+            return None
+        buf = BytesIO(); tpl.layer.save(buf, format="PNG")
+        png = _logo_pngs[side] = buf.getvalue()
+    return png
+
+def logo_data_uri(side: int) -> Optional[str]:
+    uri = _logo_uris.get(side)
+    if uri is None:
+        png = logo_png(side)
+        if png is None:
+            return None
+        uri = _logo_uris[side] = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+    return uri
+
+def warm_templates() -> bool:
+    """Подпись стиля, шаблон лого, маски ключей. False — лого нет: стиль рисуется без него, как и раньше."""
+    style_signature()
+    loaded = logo_template(QR_FIXED_SIZE) is not None
+    if not loaded:
+        logging.getLogger("uvicorn.error").warning("QR logo not loaded (%s): fixed style renders without it",
+                                                   QR_FIXED_LOGO_PATH)
+    for version in range(1, 41):
+        _finder_mask(version * 4 + 17)
+    return loaded
+
+def _paste_logo_with_pad(img: Image.Image, tpl: Optional[LogoTemplate]) -> Image.Image:
+    if tpl is not None:
+        img.paste(tpl.layer, tpl.pos, tpl.layer)
     return img
 
-def build_png_fixed_with_logo_and_finders(data: str) -> bytes:
-    img, box, modules, offset = _compute_box_and_modules(data, QR_FIXED_BORDER)
-    _recolor_finders_precise(img, box, QR_FIXED_BORDER, modules, QR_FIXED_FINDER, QR_FIXED_BG, offset=offset)
-    img = _paste_logo_with_pad(img, QR_FIXED_LOGO_PATH, QR_FIXED_LOGO_RATIO,
-                               pad_scale=QR_FIXED_LOGO_PAD, pad_radius=QR_FIXED_LOGO_PAD_RADIUS,
-                               pad_color=QR_FIXED_BG)
-    out = BytesIO()
-    img.convert("RGB").save(out, format="PNG")
-    return out.getvalue()
+# ===== сборка фирменного PNG =====
+@lru_cache(maxsize=1)
+def _fixed_palette() -> bytes:
+    return palette(QR_FIXED_BG, QR_FIXED_FILL, QR_FIXED_FINDER)
+
+def build_png_fixed_with_logo_and_finders(data: str, profile: str = "default") -> bytes:
+    style_signature()   # в воркерах пула это единственное место, где замечается новое лого
+    matrix = _encode(data, QR_FIXED_ECLEVEL, QR_FIXED_VERSION, QR_FIXED_MASK)
+    with stage("finders"):
+        indices = module_indices(matrix, finders=True)
+    with stage("raster"):
+        img = indexed_image(rasterize(indices, QR_FIXED_BORDER, QR_FIXED_SIZE), _fixed_palette()).convert("RGB")
+    with stage("logo"):
+        _paste_logo_with_pad(img, logo_template(QR_FIXED_SIZE))
+    with stage("image_encode"):
+        return encode_image(img, profile)
+
+def build_svg_fixed_with_logo_and_finders(data: str) -> bytes:
+    style_signature()
+    matrix = _encode(data, QR_FIXED_ECLEVEL, QR_FIXED_VERSION, QR_FIXED_MASK)
+    with stage("svg_write"):
+        return svg_document(matrix, QR_FIXED_BORDER, QR_FIXED_FILL, QR_FIXED_BG, finder=QR_FIXED_FINDER,
+                            logo_uri=logo_data_uri(QR_FIXED_SIZE), logo_box=fixed_logo_box(matrix.size))
+
+def fixed_logo_box(modules: int) -> Optional[Tuple[float, float, float, float]]:
+    """Лого в координатах модулей (с тихой зоной): слой собран под PNG-сторону QR_FIXED_SIZE."""
+    tpl = logo_template(QR_FIXED_SIZE)
+    if tpl is None:
+        return None
+    k = (modules + QR_FIXED_BORDER * 2) / QR_FIXED_SIZE
+    return (tpl.pos[0] * k, tpl.pos[1] * k, tpl.layer.width * k, tpl.layer.height * k)
+
+# ===== матрица для отрисовки в браузере (/qr/matrix) =====
+EC_NAMES = {ERROR_CORRECT_M: "M", ERROR_CORRECT_Q: "Q", ERROR_CORRECT_H: "H"}
+MATRIX_HEADER = struct.Struct("<2sBcB")     # b"QR", версия, уровень EC ('M'/'Q'/'H'), модулей по стороне
+
+def matrix_ec(fmt: str, style: str) -> int:
+    # тот же уровень, что у итоговой картинки: фирменный — QR_EC, PNG — Q, SVG — M
+    if style == "fixed":
+        return QR_FIXED_ECLEVEL
+    return ERROR_CORRECT_M if fmt == "svg" else ERROR_CORRECT_Q
+
+def build_matrix(data: str, fmt: str = "png", style: str = "plain", encoding: str = "json") -> bytes:
+    """
+    Матрица модулей построчно, 1 бит на модуль (MSB first, без выравнивания строк).
+    binary: MATRIX_HEADER + биты; json: метаданные + биты в base64, для fixed — ещё цвета и лого.
+    """
+    if style == "fixed":
+        style_signature()
+        matrix = _encode(data, QR_FIXED_ECLEVEL, QR_FIXED_VERSION, QR_FIXED_MASK)
+    else:
+        matrix = _encode(data, matrix_ec(fmt, style))
+    import numpy as np
+    with stage("pack"):
+        bits = np.packbits(matrix.array, axis=None).tobytes()
+        ec = EC_NAMES[matrix.ec]
+        if encoding == "binary":
+            return MATRIX_HEADER.pack(b"QR", matrix.version, ec.encode("ascii"), matrix.size) + bits
+        doc = {
+            "version": matrix.version,
+            "ec": ec,
+            "size": matrix.size,
+            "finders": finder_origins(matrix.size),
+            "bits": base64.b64encode(bits).decode("ascii"),
+            "style": None,
+        }
+        if style == "fixed":
+            box = fixed_logo_box(matrix.size)
+            doc["style"] = {
+                "fill": _svg_color(QR_FIXED_FILL),
+                "back": _svg_color(QR_FIXED_BG),
+                "finder": _svg_color(QR_FIXED_FINDER),
+                "border": QR_FIXED_BORDER,
+                "logo": "/qr/logo" if box else None,
+                "logo_box": [round(v, 3) for v in box] if box else None,
+            }
+        return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
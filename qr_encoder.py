@@ -0,0 +1,110 @@
+# qr_encoder.py
+from functools import lru_cache
+
+import numpy as np
+import qrcode
+from qrcode import util
+from qrcode.main import copy_2d_array, precomputed_qr_blanks
+
+# ===== штрафы масок (ISO 18004, как util.lost_point в qrcode, но сразу по всем 8 маскам) =====
+# окна 1:1:3:1:1 со светлой зоной в 4 модуля — те же два шаблона, что проверяет qrcode
+_FINDER_LIKE = (0b10111010000, 0b00001011101)
+_WINDOW = 11
+
+
+def _runs_penalty(stack: np.ndarray) -> np.ndarray:
+    """Правило 1: серии одного цвета длиной >= 5 по строкам -> (длина - 2). stack: (k, n, n) uint8."""
+    k, n, _ = stack.shape
+    # столбец-разделитель со значением 2 рвёт серии на границе строк
+    padded = np.full((k, n, n + 1), 2, dtype=np.uint8)
+    padded[:, :, :n] = stack
+    flat = padded.reshape(k, -1)
+    out = np.zeros(k, dtype=np.int64)
+    for i in range(k):
+        edges = np.flatnonzero(flat[i, 1:] != flat[i, :-1]) + 1
+        lengths = np.diff(edges, prepend=0, append=flat.shape[1])
+        long = lengths[lengths >= 5]
+        out[i] = int((long - 2).sum())
+    return out
+
+
+def _blocks_penalty(stack: np.ndarray) -> np.ndarray:
+    """Правило 2: 2x2 одного цвета -> 3 за каждый (с перекрытием)."""
+    a = stack[:, :-1, :-1]
+    same = (a == stack[:, :-1, 1:]) & (a == stack[:, 1:, :-1]) & (a == stack[:, 1:, 1:])
+    return same.sum(axis=(1, 2)) * 3
+
+
+def _finder_like_penalty(stack: np.ndarray) -> np.ndarray:
+    """Правило 3: 10111010000 / 00001011101 в строке -> 40."""
+    n = stack.shape[2]
+    if n < _WINDOW:
+        return np.zeros(stack.shape[0], dtype=np.int64)
+    width = n - _WINDOW + 1
+    code = np.zeros(stack.shape[:2] + (width,), dtype=np.int32)
+    for j in range(_WINDOW):
+        code = (code << 1) | stack[:, :, j:j + width]
+    hits = (code == _FINDER_LIKE[0]) | (code == _FINDER_LIKE[1])
+    return hits.sum(axis=(1, 2)) * 40
+
+
+def _balance_penalty(stack: np.ndarray) -> np.ndarray:
+    """Правило 4: каждые 5% отклонения доли тёмных от 50% -> 10. Та же float-арифметика, что в qrcode."""
+    n = stack.shape[1]
+    out = np.zeros(stack.shape[0], dtype=np.int64)
+    for i, dark in enumerate(stack.sum(axis=(1, 2)).tolist()):
+        percent = float(dark) / (n ** 2)
+        out[i] = int(abs(percent * 100 - 50) / 5) * 10
+    return out
+
+
+def lost_points(stack: np.ndarray) -> np.ndarray:
+    """Штраф для каждой матрицы стека (k, n, n); результат совпадает с util.lost_point поэлементно."""
+    stack = np.ascontiguousarray(stack, dtype=np.uint8)
+    transposed = np.ascontiguousarray(stack.transpose(0, 2, 1))
+    return (_runs_penalty(stack) + _runs_penalty(transposed)
+            + _blocks_penalty(stack)
+            + _finder_like_penalty(stack) + _finder_like_penalty(transposed)
+            + _balance_penalty(stack))
+
+
+# ===== подготовка: где данные и как выглядит каждая маска =====
+@lru_cache(maxsize=40)
+def _mask_grids(modules_count: int) -> np.ndarray:
+    # те же функции масок, что у qrcode, — чтобы не расходиться в формулах
+    rows, cols = np.indices((modules_count, modules_count))
+    grids = np.zeros((8, modules_count, modules_count), dtype=np.uint8)
+    for p in range(8):
+        grids[p] = np.vectorize(util.mask_func(p), otypes=[bool])(rows, cols)
+    grids.setflags(write=False)
+    return grids
+
+
+@lru_cache(maxsize=40)
+def _data_modules(version: int) -> np.ndarray:
+    """Модули данных версии: всё, что не шаблоны и не поля формата/номера версии."""
+    qr = qrcode.QRCode(version=version)
+    qr.modules_count = version * 4 + 17
+    qr.modules = copy_2d_array(precomputed_qr_blanks[version])
+    qr.setup_type_info(True, 0)
+    if version >= 7:
+        qr.setup_type_number(True)
+    data = np.array([[m is None for m in row] for row in qr.modules], dtype=bool)
+    data.setflags(write=False)
+    return data
+
+
+class FastMaskQRCode(qrcode.QRCode):
+    """
+    QRCode с векторным выбором маски: данные раскладываются один раз (маска 0),
+    остальные 7 вариантов получаются XOR-ом по модулям данных, штрафы считаются NumPy.
+    Выбор маски и итоговая матрица — те же, что у qrcode.QRCode.
+    """
+
+    def best_mask_pattern(self):
+        self.makeImpl(True, 0)     # заодно кладёт заготовку версии в precomputed_qr_blanks
+        base = np.array(self.modules, dtype=np.uint8)
+        grids = _mask_grids(self.modules_count)
+        stack = base[None] ^ ((grids ^ grids[0]) & _data_modules(self.version))
+        # первый минимальный — как `min_lost_point > lost_point` в qrcode
+        return int(np.argmin(lost_points(stack)))
@@ -0,0 +1,143 @@
+# render_cache.py
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from shared_cache import SharedCache, open_shared_cache
+
+# ===== лимиты (байтовый бюджет на все картинки в памяти процесса) =====
+QR_CACHE_MAX_BYTES = int(os.getenv("QR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))   # 0 — кэш выключен
+QR_CACHE_MAX_ITEM_BYTES = int(os.getenv("QR_CACHE_MAX_ITEM_BYTES", str(4 * 1024 * 1024)))
+# второй уровень: mmap-файл, общий для `uvicorn --workers N` на хосте; пустой путь — выключен
+QR_SHARED_CACHE_PATH = os.getenv("QR_SHARED_CACHE_PATH", "")
+QR_SHARED_CACHE_BYTES = int(os.getenv("QR_SHARED_CACHE_BYTES", str(256 * 1024 * 1024)))
+QR_SHARED_CACHE_SLOTS = int(os.getenv("QR_SHARED_CACHE_SLOTS", "65536"))
+
+
+class RenderCache:
+    """
+    LRU-кэш готовых картинок по ETag-ключу с бюджетом в байтах.
+    Одинаковые запросы, пришедшие пока идёт рендер, ждут этот же рендер, а не запускают свой.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int, shared: Optional[SharedCache] = None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return content
+
+    def length(self, key: str) -> Optional[int]:
+        # для HEAD: без учёта в hits и без сдвига в LRU
+        with self._lock:
+            content = self._items.get(key)
+            return None if content is None else len(content)
+
+    def put(self, key: str, content: bytes) -> None:
+        size = len(content)
+        if size > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = content
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def _claim(self, key: str) -> Tuple[Optional[bytes], Optional[Future], bool]:
+        # (готовый ответ) | (чужой рендер, которого ждём) | (наш рендер, owner=True)
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return content, None, False
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.merged += 1
+                return None, fut, False
+            fut = self._inflight[key] = Future()
+            self.misses += 1
+            return None, fut, True
+
+    def _finish(self, key: str, fut: Future, content: bytes = None, error: BaseException = None) -> None:
+        if error is None:
+            self.put(key, content)
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is None:
+            fut.set_result(content)
+        else:
+            fut.set_exception(error)
+
+    def _shared_get(self, key: str) -> Optional[bytes]:
+        return self.shared.get(key) if self.shared is not None else None
+
+    def _shared_put(self, key: str, content: bytes) -> None:
+        if self.shared is not None:
+            self.shared.put(key, content)
+
+    async def aget_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        content, fut, owner = self._claim(key)
+        if content is not None:
+            return content
+        if not owner:
+            # shield: отмена одного ожидающего клиента не должна отменять общий рендер
+            return await asyncio.shield(asyncio.wrap_future(fut))
+        try:
+            # другой воркер мог уже отрендерить — тогда только копия из mmap
+            content = self._shared_get(key)
+            if content is None:
+                content = await render()
+                self._shared_put(key, content)
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, content)
+        return content
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "merged": self.merged,
+                "evictions": self.evictions,
+                "inflight": len(self._inflight),
+                "shared": self.shared.stats() if self.shared is not None else None,
+            }
+
+
+RENDER_CACHE = RenderCache(
+    QR_CACHE_MAX_BYTES, QR_CACHE_MAX_ITEM_BYTES,
+    open_shared_cache(QR_SHARED_CACHE_PATH, QR_SHARED_CACHE_BYTES, QR_SHARED_CACHE_SLOTS, QR_CACHE_MAX_ITEM_BYTES),
+)
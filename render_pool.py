@@ -0,0 +1,195 @@
+# render_pool.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import collect, current_recorder, merge_stages, profiled
+
+from qr_core import (
+    build_matrix,
+    build_png,
+    build_png_fixed_with_logo_and_finders,
+    build_svg,
+    build_svg_fixed_with_logo_and_finders,
+    style_signature,
+    warm_templates,
+)
+
+# 0 — рендер как раньше, в тредпуле Starlette; N — N процессов-воркеров
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "0"))
+
+RENDER_JOBS = {
+    "png": build_png,
+    "svg": build_svg,
+    "fixed": build_png_fixed_with_logo_and_finders,
+    "fixed_svg": build_svg_fixed_with_logo_and_finders,
+    "matrix": build_matrix,
+}
+
+
+def warm_up(samples: Sequence[str] = ()) -> bool:
+    # импорт numpy/PIL/qrcode, лого и шаблоны, первый ресемплинг и zlib — до первого настоящего запроса;
+    # samples — типовые строки (по FORM_SPEC), кодируются на уровнях PNG (Q) и SVG (M); True — лого загружено
+    logo = warm_templates()
+    build_png_fixed_with_logo_and_finders("warmup")
+    build_svg_fixed_with_logo_and_finders("warmup")
+    for data in samples or ("warmup",):
+        build_png(data, 512, 2, "black", "white")
+        build_svg(data, 2)
+    return logo
+
+
+def _init_worker(samples: Sequence[str]) -> None:
+    # исключение из initializer ломает весь пул (BrokenProcessPool на каждый рендер) — прогрев лишь оптимизация
+    try:
+        warm_up(samples)
+    except Exception:
+        logging.getLogger("uvicorn.error").exception("QR render worker warmup failed")
+
+
+def _run_job(kind: str, args: tuple, profile: bool = False, signature: Optional[str] = None):
+    # ETag посчитан родителем по его подписи стиля: воркер со своим интервалом проверки мог ещё
+    # не заметить новое лого — перечитываем сразу, иначе под новым ETag закэшируется старая картинка
+    if signature is not None and style_signature() != signature:
+        style_signature(force=True)
+    # стадии воркера возвращаются вместе с картинкой — родитель допишет их в метрики запроса
+    with collect() as rec:
+        rec.endpoint, rec.profile = kind, profile
+        content = profiled(RENDER_JOBS[kind], *args)
+    return content, rec.stages, rec.version
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RenderPool:
+    """
+    Рендер в пуле процессов (обходит GIL), либо в тредпуле, если воркеров 0.
+    Умер воркер (OOM, segfault) — пул сломан целиком: пересоздаём его и повторяем задачу один раз.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._samples: Sequence[str] = ()
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.restarts = 0
+        self.broken = False         # повтор после пересоздания тоже упал; сбрасывается первым удачным рендером
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, а не fork: в родителе уже крутится event loop и треды
+        ctx = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                   initializer=_init_worker, initargs=(tuple(self._samples),))
+
+    def start(self, samples: Sequence[str] = ()) -> None:
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._samples = tuple(samples)
+        self._executor = self._new_executor()
+        # поднимаем все процессы сразу, чтобы прогрев не достался первым клиентам
+        for f in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            f.result()
+
+    def warm(self, samples: Sequence[str] = ()) -> bool:
+        """Прогрев до готовности: процессы пула греются сами, в режиме тредпула — этот процесс. True — есть лого."""
+        self.start(samples)
+        if self._executor is None:
+            return warm_up(samples)
+        return warm_templates()     # /qr/logo и подпись стиля считаются здесь, а не в воркерах
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return              # уже пересоздан другим запросом (или пул погашен)
+            self._executor = self._new_executor()
+            self.restarts += 1
+        logging.getLogger("uvicorn.error").warning("QR render pool broken, restarted (%d)", self.restarts)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, *job):
+        for retry in (True, False):
+            executor = self._executor
+            try:
+                result = await asyncio.wrap_future(executor.submit(*job))
+            except BrokenProcessPool:
+                if not retry:
+                    self.broken = True
+                    raise
+                self._restart(executor)
+            else:
+                self.broken = False
+                return result
+
+    def _submit_sync(self, *job):
+        for retry in (True, False):
+            executor = self._executor
+            try:
+                result = executor.submit(*job).result()
+            except BrokenProcessPool:
+                if not retry:
+                    self.broken = True
+                    raise
+                self._restart(executor)
+            else:
+                self.broken = False
+                return result
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.pending += 1
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    async def render(self, kind: str, *args) -> bytes:
+        self._enter()
+        try:
+            if self._executor is not None:
+                rec = current_recorder()
+                content, stages, version = await self._submit(
+                    _run_job, kind, args, bool(rec and rec.profile), style_signature())
+                merge_stages(stages, version)
+                return content
+            return await run_in_threadpool(profiled, RENDER_JOBS[kind], *args)
+        finally:
+            self._leave()
+
+    def render_sync(self, kind: str, *args) -> bytes:
+        self._enter()
+        try:
+            if self._executor is not None:
+                return self._submit_sync(_run_job, kind, args, False, style_signature())[0]
+            return RENDER_JOBS[kind](*args)
+        finally:
+            self._leave()
+
+    def stats(self) -> dict:
+        return {
+            "mode": "process" if self._executor is not None else "thread",
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "completed": self.completed,
+            "restarts": self.restarts,
+            "broken": self.broken,
+        }
+
+
+RENDER_POOL = RenderPool(QR_RENDER_WORKERS)
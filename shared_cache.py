@@ -0,0 +1,151 @@
+# shared_cache.py
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:          # Windows: общего кэша нет, остаётся кэш процесса
+    fcntl = None
+
+# ===== раскладка файла: заголовок | индекс (открытая адресация) | кольцевой журнал записей =====
+_MAGIC = b"QRSC"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIIQQ")      # magic, version, slots, data_size, head (логическое смещение записи)
+_HEADER_SIZE = 4096
+_ENTRY = struct.Struct("<32sQII")       # sha256 ETag, логическое смещение, длина, crc32
+_RECORD = struct.Struct("<32sII")       # копия ключа и длины перед данными — проверка, что запись не перезаписана
+_PROBES = 8
+
+
+class SharedCache:
+    """
+    Кэш картинок, общий для воркеров uvicorn на одном хосте: mmap файла фиксированного размера.
+    Данные пишутся по кругу (вытеснение — самые старые), индекс хранит логическое смещение:
+    запись жива, пока журнал не ушёл дальше неё на весь объём. Писатели — flock LOCK_EX, читатели — LOCK_SH;
+    внутри процесса ещё и threading.Lock (flock на одном дескрипторе между тредами не блокирует).
+    """
+
+    def __init__(self, path: str, data_size: int, slots: int, max_item_bytes: int):
+        self.path = path
+        self.data_size = data_size
+        self.slots = slots
+        self.max_item_bytes = min(max_item_bytes, data_size - _RECORD.size)
+        self._index_at = _HEADER_SIZE
+        self._data_at = _HEADER_SIZE + slots * _ENTRY.size
+        total = self._data_at + data_size
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(fcntl.LOCK_EX):
+            if os.fstat(self._fd).st_size != total:
+                os.ftruncate(self._fd, total)
+            self._mm = mmap.mmap(self._fd, total)
+            magic, version, s, d, _ = _HEADER.unpack_from(self._mm, 0)
+            # файл переживает рестарт воркеров; чужой формат или другая геометрия — начинаем с нуля
+            if (magic, version, s, d) != (_MAGIC, _VERSION, slots, data_size):
+                self._reset()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.corrupt = 0
+
+    @contextmanager
+    def _locked(self, mode: int):
+        with self._lock:
+            fcntl.flock(self._fd, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reset(self) -> None:
+        self._mm[self._index_at:self._data_at] = bytes(self._data_at - self._index_at)
+        _HEADER.pack_into(self._mm, 0, _MAGIC, _VERSION, self.slots, self.data_size, 0)
+
+    def _head(self) -> int:
+        return _HEADER.unpack_from(self._mm, 0)[4]
+
+    def _probe(self, key: bytes):
+        start = int.from_bytes(key[:8], "little") % self.slots
+        for i in range(_PROBES):
+            yield self._index_at + ((start + i) % self.slots) * _ENTRY.size
+
+    def get(self, etag: str) -> Optional[bytes]:
+        key = bytes.fromhex(etag)
+        with self._locked(fcntl.LOCK_SH):
+            head = self._head()
+            for at in self._probe(key):
+                ekey, offset, length, crc = _ENTRY.unpack_from(self._mm, at)
+                if ekey != key:
+                    continue
+                if offset < head - self.data_size:
+                    break                                   # журнал уже прошёл по этому месту
+                pos = self._data_at + offset % self.data_size
+                rkey, rlen, _ = _RECORD.unpack_from(self._mm, pos)
+                if rkey != key or rlen != length:
+                    break
+                start = pos + _RECORD.size
+                content = self._mm[start:start + length]   # единственная копия: mmap -> bytes
+                if zlib.crc32(content) != crc:
+                    self.corrupt += 1
+                    break
+                self.hits += 1
+                return content
+        self.misses += 1
+        return None
+
+    def put(self, etag: str, content: bytes) -> None:
+        size = len(content)
+        if size > self.max_item_bytes:
+            return
+        key = bytes.fromhex(etag)
+        crc = zlib.crc32(content)
+        with self._locked(fcntl.LOCK_EX):
+            head = self._head()
+            if head % self.data_size + _RECORD.size + size > self.data_size:
+                head += self.data_size - head % self.data_size     # запись не рвём на конце кольца
+            pos = self._data_at + head % self.data_size
+            _RECORD.pack_into(self._mm, pos, key, size, crc)
+            self._mm[pos + _RECORD.size:pos + _RECORD.size + size] = content
+            new_head = head + _RECORD.size + size
+            _HEADER.pack_into(self._mm, 0, _MAGIC, _VERSION, self.slots, self.data_size, new_head)
+            # слот: тот же ключ, пустой или устаревший; иначе — самый старый из проб
+            victim, oldest = None, None
+            for at in self._probe(key):
+                ekey, offset, _, _ = _ENTRY.unpack_from(self._mm, at)
+                if ekey == key or ekey == bytes(32) or offset < new_head - self.data_size:
+                    victim = at
+                    break
+                if oldest is None or offset < oldest:
+                    victim, oldest = at, offset
+            _ENTRY.pack_into(self._mm, victim, key, head, size, crc)
+            self.stores += 1
+
+    def clear(self) -> None:
+        with self._locked(fcntl.LOCK_EX):
+            self._reset()
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "data_size": self.data_size,
+            "written": self._head(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "corrupt": self.corrupt,
+        }
+
+
+def open_shared_cache(path: str, data_size: int, slots: int, max_item_bytes: int) -> Optional[SharedCache]:
+    if not path or data_size <= 0 or fcntl is None:
+        return None
+    return SharedCache(path, data_size, slots, max_item_bytes)
@@ -0,0 +1,61 @@
+# выгрузки под допуском: не больше доли слотов, обычные запросы в очереди — первыми
+import asyncio
+
+from admission import Admission
+
+
+class _Request:
+    client = None
+
+
+def test_batch_share_and_priority():
+    async def scenario():
+        adm = Admission(concurrency=4, queue=8, timeout=5, retry_after=1, rate=0, burst=1, batch_share=0.5)
+        gates = {}
+        peak = {"batch": 0}
+
+        async def work(tag):
+            peak["batch"] = max(peak["batch"], adm.batch_active)
+            await gates.setdefault(tag, asyncio.Event()).wait()
+            return b""
+
+        batch = [asyncio.ensure_future(adm.run_batch(lambda i=i: work(f"b{i}"))) for i in range(6)]
+        await asyncio.sleep(0)
+        assert adm.batch_active == 2 and adm.active == 2     # вторая половина слотов свободна
+        plain = [asyncio.ensure_future(adm.run(_Request(), lambda i=i: work(f"r{i}"))) for i in range(3)]
+        await asyncio.sleep(0)
+        assert adm.active == 4 and len(adm._waiters) == 1
+        gates["b0"].set()
+        await batch[0]
+        # освободившийся слот выгрузки достался ждущему запросу, а не следующей строке
+        assert not adm._waiters and adm.batch_active == 1 and len(adm._batch_waiters) == 4
+        for _ in range(6):
+            for gate in list(gates.values()):
+                gate.set()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*batch, *plain)
+        assert peak["batch"] == 2
+        assert adm.active == 0 and adm.batch_active == 0
+
+    asyncio.run(scenario())
+
+
+def test_batch_waiter_cancel_releases_slot():
+    async def scenario():
+        adm = Admission(concurrency=1, queue=8, timeout=5, retry_after=1, rate=0, burst=1, batch_share=1.0)
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+            return b""
+
+        first = asyncio.ensure_future(adm.run_batch(work))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(adm.run_batch(work))
+        await asyncio.sleep(0)
+        second.cancel()
+        gate.set()
+        await first
+        assert adm.active == 0 and adm.batch_active == 0 and not adm._batch_waiters
+
+    asyncio.run(scenario())
@@ -0,0 +1,32 @@
+# цвета проверяются на входе: 422, а не 500 из ImageColor при рендере
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("fmt", ["png", "svg"])
+@pytest.mark.parametrize("field", ["fill_color", "back_color"])
+def test_invalid_color_is_422(client, fmt, field):
+    params = {"data": "colors", "format": fmt, field: "not-a-color"}
+    assert client.get("/qr", params=params).status_code == 422
+    assert client.post("/qr", json=params).status_code == 422
+    body = {"type": "url", "fields": {"url": "https://example.com"}, "format": fmt, field: "#12345"}
+    assert client.post("/qr/compose", json=body).status_code == 422
+
+
+@pytest.mark.parametrize("fmt, color, status", [
+    ("png", "#FF0000", 200),
+    ("png", "rgb(0, 128, 0)", 200),
+    ("svg", "navy", 200),
+    ("svg", "transparent", 200),
+    ("png", "transparent", 422),     # в палитре PNG прозрачности нет
+])
+def test_color_formats(client, fmt, color, status):
+    resp = client.get("/qr", params={"data": f"colors-{fmt}-{color}", "format": fmt, "back_color": color})
+    assert resp.status_code == status
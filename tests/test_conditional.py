@@ -0,0 +1,135 @@
+# 304 и HEAD отвечаются до рендера: ни задачи пула, ни кодирования QR
+import time
+import uuid
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import qr_core
+import render_pool
+
+STALE = "Mon, 01 Jan 2001 00:00:00 GMT"
+
+
+@pytest.fixture
+def client():
+    # без with — lifespan (прогрев) не запускается, первый рендер был бы честным промахом
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Счётчик вызовов RENDER_JOBS и qr_core.encode_matrix (режим тредпула, всё в этом процессе)."""
+    calls = []
+
+    def counted(name, fn):
+        def wrapper(*args, **kwargs):
+            calls.append(name)
+            return fn(*args, **kwargs)
+        return wrapper
+
+    for kind, fn in list(render_pool.RENDER_JOBS.items()):
+        monkeypatch.setitem(render_pool.RENDER_JOBS, kind, counted(kind, fn))
+    monkeypatch.setattr(qr_core, "encode_matrix", counted("encode_matrix", qr_core.encode_matrix))
+    return calls
+
+
+def _qr_params():
+    return "/qr", {"data": f"conditional-{uuid.uuid4().hex}"}
+
+
+def _vcard_params():
+    return "/qr/vcard", {"fn": f"Тест {uuid.uuid4().hex}", "org": "ООО Тест"}
+
+
+ENDPOINTS = pytest.mark.parametrize("endpoint", [_qr_params, _vcard_params], ids=["qr", "vcard"])
+
+
+def _etag(client, path, params) -> str:
+    resp = client.head(path, params=params)
+    assert resp.status_code == 200
+    return resp.headers["etag"]
+
+
+@ENDPOINTS
+def test_head_does_not_render(client, renders, endpoint):
+    path, params = endpoint()
+    resp = client.head(path, params=params)
+    assert resp.status_code == 200
+    assert resp.headers["etag"]
+    assert renders == []
+
+
+@ENDPOINTS
+@pytest.mark.parametrize("header", [
+    lambda etag: etag,
+    lambda etag: f'"other", "{etag}"',
+    lambda etag: f'W/"{etag}"',
+    lambda etag: "*",
+], ids=["exact", "list", "weak", "star"])
+def test_if_none_match_does_not_render(client, renders, endpoint, header):
+    path, params = endpoint()
+    etag = _etag(client, path, params)
+    resp = client.get(path, params=params, headers={"If-None-Match": header(etag)})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert resp.content == b""
+    assert renders == []
+
+
+@ENDPOINTS
+def test_if_modified_since_current_does_not_render(client, renders, endpoint):
+    path, params = endpoint()
+    resp = client.get(path, params=params, headers={"If-Modified-Since": formatdate(time.time(), usegmt=True)})
+    assert resp.status_code == 304
+    assert renders == []
+
+
+@ENDPOINTS
+def test_if_modified_since_stale_renders(client, renders, endpoint):
+    path, params = endpoint()
+    resp = client.get(path, params=params, headers={"If-Modified-Since": STALE})
+    assert resp.status_code == 200
+    assert resp.content
+    assert "encode_matrix" in renders
+    assert len(renders) > 1     # задача пула и кодирование
+
+
+@ENDPOINTS
+def test_if_none_match_mismatch_renders(client, renders, endpoint):
+    path, params = endpoint()
+    # с If-None-Match дата не смотрится: чужой ETag — рендер, даже при свежем If-Modified-Since
+    resp = client.get(path, params=params, headers={"If-None-Match": '"other"',
+                                                    "If-Modified-Since": formatdate(time.time(), usegmt=True)})
+    assert resp.status_code == 200
+    assert "encode_matrix" in renders
+
+
+def test_vcard_precheck_skips_prerender_store(client, renders, monkeypatch, tmp_path):
+    import vcard_portal
+    from prerender import PrerenderStore
+
+    lookups = []
+    store = PrerenderStore(str(tmp_path))
+    monkeypatch.setattr(store, "lookup", lambda etag, ext: lookups.append(etag))
+    monkeypatch.setattr(vcard_portal, "PRERENDER_STORE", store)
+    path, params = _vcard_params()
+    etag = client.head(path, params=params).headers["etag"]
+    assert client.get(path, params=params, headers={"If-None-Match": etag}).status_code == 304
+    assert lookups == [] and renders == []
+
+
+@pytest.mark.parametrize("fmt, old_key", [
+    ("svg", "versioned|svg|512|2|red|white"),
+    ("png", "versioned|png|512|2|red|white"),
+])
+def test_etag_carries_renderer_version(client, fmt, old_key):
+    import hashlib
+
+    params = {"data": "versioned", "format": fmt, "fill_color": "red"}
+    old = hashlib.sha256(old_key.encode()).hexdigest()     # ETag прежнего рендерера
+    etag = client.head("/qr", params=params).headers["etag"]
+    assert etag != old
+    assert client.get("/qr", params=params, headers={"If-None-Match": old}).status_code == 200
@@ -0,0 +1,25 @@
+# QR_VERSION / QR_MASK вне диапазона — ошибка при импорте, а не 500 на первом /qr/vcard
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+def _import_qr_core(**env):
+    return subprocess.run([sys.executable, "-c", "import qr_core"], capture_output=True, text=True,
+                          env={**os.environ, **env}, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+
+@pytest.mark.parametrize("name, value", [("QR_MASK", "9"), ("QR_MASK", "-1"), ("QR_VERSION", "41"),
+                                         ("QR_VERSION", "-3")])
+def test_out_of_range_fails_fast(name, value):
+    res = _import_qr_core(**{name: value})
+    assert res.returncode != 0
+    assert f"{name}={value}" in res.stderr
+
+
+@pytest.mark.parametrize("env", [{"QR_MASK": "0"}, {"QR_MASK": "7"}, {"QR_VERSION": "1"}, {"QR_VERSION": "40"},
+                                 {"QR_VERSION": "0", "QR_MASK": ""}])
+def test_in_range_imports(env):
+    assert _import_qr_core(**env).returncode == 0
@@ -0,0 +1,19 @@
+# счётчики кэша — counter с _total, размеры — gauge
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _types(text: str) -> dict:
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE"))
+
+
+def test_render_cache_counters():
+    client = TestClient(main.app)
+    client.get("/qr", params={"data": "metrics"})
+    types = _types(client.get("/metrics").text)
+    for k in ("hits", "misses", "merged", "evictions"):
+        assert types[f"qr_render_cache_{k}_total"] == "counter"
+        assert f"qr_render_cache_{k}" not in types
+    for k in ("items", "bytes", "max_bytes", "inflight"):
+        assert types[f"qr_render_cache_{k}"] == "gauge"
@@ -0,0 +1,30 @@
+# --prune чистит только перерендеренные форматы
+import json
+import os
+
+import prerender
+
+
+def _run(tmp_path, rows, *args):
+    src = tmp_path / "rows.json"
+    src.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    assert prerender.main([str(src), "--out", str(tmp_path / "store"), "--workers", "0", *args]) == 0
+    return sorted(os.path.relpath(p, tmp_path / "store") for p in prerender.PrerenderStore(str(tmp_path / "store")).files())
+
+
+def test_prune_keeps_other_formats(tmp_path):
+    old = [{"fn": "Старый", "org": "O"}]
+    new = [{"fn": "Новый", "org": "O"}]
+    before = _run(tmp_path, old, "--format", "png", "svg")
+    assert sum(p.endswith(".png") for p in before) == 2 and sum(p.endswith(".svg") for p in before) == 2
+
+    after = _run(tmp_path, new, "--format", "svg", "--prune")
+    assert [p for p in after if p.endswith(".png")] == [p for p in before if p.endswith(".png")]
+    svgs = [p for p in after if p.endswith(".svg")]
+    assert len(svgs) == 2 and not set(svgs) & set(before)
+
+
+def test_prune_keeps_other_os(tmp_path):
+    rows = [{"fn": "Иван", "org": "O"}]
+    both = _run(tmp_path, rows)
+    assert _run(tmp_path, rows, "--os", "ios", "--prune") == both
@@ -0,0 +1,22 @@
+# список профилей один на всё: Query-валидация, быстрый путь и ENCODE_PROFILES не расходятся
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from fast_path import FAST_ROUTES, parse_query
+from qr_core import ENCODE_PROFILES, PLAIN_ONLY_PROFILES
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("profile", [*ENCODE_PROFILES, "bogus"])
+def test_profile_validation_matches(client, profile):
+    known = profile in ENCODE_PROFILES
+    fixed = known and profile not in PLAIN_ONLY_PROFILES
+    assert (client.head("/qr", params={"data": "p", "profile": profile}).status_code == 200) == known
+    assert (client.head("/qr/vcard", params={"fn": "F", "org": "O", "profile": profile}).status_code == 200) == fixed
+    assert (parse_query(FAST_ROUTES["/qr"], f"data=p&profile={profile}".encode()) is not None) == known
+    assert (parse_query(FAST_ROUTES["/qr/vcard"], f"fn=F&org=O&profile={profile}".encode()) is not None) == fixed
@@ -0,0 +1,71 @@
+# воркер пула сверяет подпись стиля с родителем и перечитывает лого, не дожидаясь своего интервала
+import time
+
+import qr_core
+import render_pool
+
+
+def test_stale_worker_reloads_logo(monkeypatch):
+    signature = qr_core.style_signature(force=True)
+    # воркер «не видел» новое лого: подпись старая, а проверка ещё свежая
+    monkeypatch.setattr(qr_core, "STYLE_SIGNATURE", "stale")
+    monkeypatch.setattr(qr_core, "QR_FIXED_LOGO_HASH", "stale")
+    monkeypatch.setattr(qr_core, "_logo_checked_at", time.monotonic())
+    assert qr_core.style_signature() == "stale"
+
+    content, _, _ = render_pool._run_job("fixed", ("pool",), False, signature)
+    assert qr_core.STYLE_SIGNATURE == signature
+    assert content == qr_core.build_png_fixed_with_logo_and_finders("pool")
+
+
+def test_current_worker_skips_reload(monkeypatch):
+    signature = qr_core.style_signature(force=True)
+    calls = []
+    monkeypatch.setattr(qr_core, "_file_hash", lambda path: calls.append(path))
+    render_pool._run_job("matrix", ("pool", "png", "fixed", "json"), False, signature)
+    assert calls == []
+
+
+def test_pool_recovers_from_dead_worker():
+    import asyncio
+    import os
+    import signal
+
+    pool = render_pool.RenderPool(1)
+    pool.start()
+    try:
+        for pid in list(pool._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        content = asyncio.run(pool.render("png", "after-crash", 128, 1, "black", "white"))
+        assert content.startswith(b"\x89PNG")
+        assert pool.restarts == 1 and not pool.broken
+        assert pool.render_sync("svg", "sync", 1).startswith(b"<")
+    finally:
+        pool.shutdown()
+
+
+def test_pool_marked_broken_when_retry_fails(monkeypatch):
+    import pytest
+    from concurrent.futures.process import BrokenProcessPool
+    from fastapi.testclient import TestClient
+
+    import main
+
+    class Dead:
+        def submit(self, *args):
+            raise BrokenProcessPool("dead")
+
+        def shutdown(self, **kwargs):
+            pass
+
+    pool = render_pool.RenderPool(1)
+    pool._executor = Dead()
+    monkeypatch.setattr(pool, "_new_executor", Dead)
+    with pytest.raises(BrokenProcessPool):
+        pool.render_sync("svg", "x", 1)
+    assert pool.broken and pool.restarts == 1
+    assert pool.stats()["broken"] is True
+
+    monkeypatch.setattr(main, "RENDER_POOL", pool)
+    monkeypatch.setitem(main.WARMUP, "state", "ready")
+    assert TestClient(main.app).get("/readyz").status_code == 503
@@ -0,0 +1,41 @@
+# лого необязательно: без файла прогрев завершается, /readyz — ready с "logo": null
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import qr_core
+
+
+@pytest.fixture
+def no_logo(monkeypatch, tmp_path):
+    monkeypatch.setattr(qr_core, "QR_FIXED_LOGO_PATH", str(tmp_path / "missing.png"))
+    qr_core.style_signature(force=True)
+    yield
+    monkeypatch.undo()
+    qr_core.style_signature(force=True)
+
+
+def _ready(client) -> dict:
+    deadline = time.monotonic() + 30
+    while main.WARMUP["state"] in ("starting", "warming") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    resp = client.get("/readyz")
+    return resp.status_code, resp.json()
+
+
+def test_missing_logo_is_ready(no_logo, monkeypatch):
+    monkeypatch.setattr(main, "QR_WARMUP", True)
+    with TestClient(main.app) as client:
+        status, body = _ready(client)
+        assert status == 200 and body["state"] == "ready" and body["logo"] is None
+        assert client.get("/qr/vcard", params={"fn": "Без лого", "org": "O"}).status_code == 200
+        assert client.get("/qr/logo").status_code == 404
+
+
+def test_logo_reported(monkeypatch):
+    monkeypatch.setattr(main, "QR_WARMUP", True)
+    with TestClient(main.app) as client:
+        status, body = _ready(client)
+        assert status == 200 and body["logo"] == qr_core.QR_FIXED_LOGO_PATH
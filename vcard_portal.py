@@ -1,12 +1,28 @@
 # vcard_portal.py
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from admission import ADMISSION
+from conditional import precheck
 from qr_core import (
-    build_png_fixed_with_logo_and_finders,
-    respond_fixed_png,
-    STYLE_SIGNATURE,
+    FIXED_PROFILE_PATTERN,
+    _safe_ascii_filename,
+    fixed_etag,
+    fixed_headers,
+    profile_media,
+    style_mtime,
+    style_signature,
 )
+from metrics import track
+from prerender import PRERENDER_STORE
+from render_cache import RENDER_CACHE
+from render_pool import RENDER_POOL
+import asyncio
+import csv
+import io
+import json
 import os
 import re
+import zipfile
 
 router = APIRouter()
 
@@ -137,9 +153,23 @@ def _build_vcard_android(fn, org, title, dept, email, mobile, work_short):
     lines.append("END:VCARD")
     return _join_crlf(lines)
 
+def _build_vcard(os_profile, fn, org, title, dept, email, mobile, work_short):
+    if os_profile == "ios":
+        return _build_vcard_ios(fn, org, title, dept, email, mobile, work_short)
+    return _build_vcard_android(fn, org, title, dept, email, mobile, work_short)
+
+def _vcard_etag_key(vcard: str, os_profile: str, fmt: str = "png", profile: str = "default") -> str:
+    parts = [vcard, style_signature(), f"os={os_profile}", f"extbase={VCARD_EXT_BASE}"]
+    # у PNG по умолчанию ключ прежний, чтобы не сбросить кэши браузеров
+    if fmt != "png":
+        parts.append(f"fmt={fmt}")
+    elif profile != "default":
+        parts.append(f"profile={profile}")
+    return "|".join(parts)
+
 # --------- endpoint ---------
-@router.get("/qr/vcard")
-def qr_vcard_fixed(
+@router.api_route("/qr/vcard", methods=["GET", "HEAD"])
+async def qr_vcard_fixed(
     request: Request,
     fn: str = Query(..., description="ФИО одной строкой"),
     org: str = Query(..., description="Организация"),
@@ -150,6 +180,8 @@ def qr_vcard_fixed(
     work_short: str = Query("", description="Короткий рабочий, например 002-8042"),
     os: str = Query("ios", pattern="^(ios|android)$", description="Профиль вкарды: ios|android"),
     filename: str = Query("vcard_qr", description="Имя файла"),
+    format: str = Query("png", pattern="^(png|svg)$", description="png|svg (в SVG лого встраивается)"),
+    profile: str = Query("default", pattern=FIXED_PROFILE_PATTERN, description="Профиль кодирования PNG"),
 ):
     """
     Два профиля:
@@ -162,11 +194,140 @@ def qr_vcard_fixed(
         * Внутренний: TEL;TYPE=OTHER: 002-84-80
     Общие поля: N/FN, ORG(+dept), TITLE/ROLE (в iOS), EMAIL, CELL, NOTE (дубли текста).
     """
-    if os == "ios":
-        vcard = _build_vcard_ios(fn, org, title, dept, email, mobile, work_short)
-    else:
-        vcard = _build_vcard_android(fn, org, title, dept, email, mobile, work_short)
-
-    png = build_png_fixed_with_logo_and_finders(vcard)
-    etag_key = "|".join([vcard, STYLE_SIGNATURE, f"os={os}", f"extbase={VCARD_EXT_BASE}"])
-    return respond_fixed_png(request, data_key=etag_key, content=png, filename=filename)
+    vcard = _build_vcard(os, fn, org, title, dept, email, mobile, work_short)
+    etag_key = _vcard_etag_key(vcard, os, format, profile)
+    etag = fixed_etag(etag_key)
+    media, ext = ("image/svg+xml", "svg") if format == "svg" else profile_media(profile)
+    last_modified = style_mtime()
+    headers = fixed_headers(filename, ext, etag, last_modified)
+    with track("vcard", format) as rec:
+        # 304 и HEAD — по входным параметрам, без qrcode/PIL и без обращения к диску
+        early = precheck(request, etag=etag, headers=headers, media_type=media,
+                         last_modified=last_modified, length=RENDER_CACHE.length(etag))
+        if early is not None:
+            rec.status = early.status_code
+            return early
+        # предрендер с диска (python -m prerender) — только для профиля по умолчанию
+        stored = PRERENDER_STORE.lookup(etag, ext) if PRERENDER_STORE and profile == "default" else None
+        if stored:
+            rec.nbytes = stored.st_size
+            return FileResponse(PRERENDER_STORE.path(etag, ext), media_type=media, headers=headers,
+                                stat_result=stored)
+        if format == "svg":
+            render = lambda: RENDER_POOL.render("fixed_svg", vcard)
+        else:
+            render = lambda: RENDER_POOL.render("fixed", vcard, profile)
+        content = await RENDER_CACHE.aget_or_render(etag, lambda: ADMISSION.run(request, render))
+        rec.nbytes = len(content)
+        return Response(content=content, media_type=media, headers=headers)
+
+# --------- batch: много vCard -> один ZIP ---------
+QR_BATCH_MAX_ROWS = int(os.getenv("QR_BATCH_MAX_ROWS", "10000"))
+QR_BATCH_WINDOW = int(os.getenv("QR_BATCH_WINDOW", "8"))      # сколько рендеров держим в работе одновременно
+
+BATCH_FIELDS = ("fn", "org", "title", "dept", "email", "mobile", "work_short")
+
+def _parse_batch_rows(body: bytes, content_type: str):
+    if "json" in content_type:
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            raise HTTPException(400, "Невалидный JSON")
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise HTTPException(400, "Ожидается JSON-массив объектов")
+        return rows
+    if "csv" in content_type or "text/plain" in content_type:
+        text = body.decode("utf-8-sig")
+        try:
+            dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        return list(csv.DictReader(io.StringIO(text), dialect=dialect))
+    raise HTTPException(415, "Нужен application/json или text/csv")
+
+def _normalize_batch_row(i: int, row: dict, default_os: str) -> dict:
+    f = {k: str(row.get(k) or "").strip() for k in BATCH_FIELDS}
+    if not f["fn"] or not f["org"]:
+        raise HTTPException(422, f"Строка {i + 1}: fn и org обязательны")
+    f["os"] = str(row.get("os") or default_os).strip().lower()
+    if f["os"] not in ("ios", "android"):
+        raise HTTPException(422, f"Строка {i + 1}: os должен быть ios или android")
+    f["filename"] = str(row.get("filename") or "").strip()
+    return f
+
+class _ZipSink(io.RawIOBase):
+    # zipfile пишет сюда, генератор забирает накопленное после каждой записи
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _render_batch_row(row: dict) -> bytes:
+    vcard = _build_vcard(row["os"], *(row[k] for k in BATCH_FIELDS))
+    etag = fixed_etag(_vcard_etag_key(vcard, row["os"]))
+    png = RENDER_CACHE.get(etag) or (PRERENDER_STORE.read(etag, "png") if PRERENDER_STORE else None)
+    if png is not None:
+        return png
+    # в общий кэш не кладём: выгрузка на всю компанию вымыла бы горячие записи;
+    # под допуск — долей слотов, чтобы выгрузка не вытеснила интерактивные запросы
+    return await ADMISSION.run_batch(lambda: RENDER_POOL.render("fixed", vcard))
+
+async def _stream_batch_zip(rows):
+    sink = _ZipSink()
+    used = set()
+    pending = []
+    it = iter(enumerate(rows))
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+            while True:
+                while len(pending) < QR_BATCH_WINDOW:
+                    nxt = next(it, None)
+                    if nxt is None:
+                        break
+                    i, row = nxt
+                    pending.append((i, row, asyncio.ensure_future(_render_batch_row(row))))
+                if not pending:
+                    break
+                i, row, task = pending.pop(0)
+                png = await task
+                base = _safe_ascii_filename(row["filename"] or row["fn"], f"vcard_qr_{i + 1}")
+                name, n = base, 1
+                while name in used:
+                    n += 1
+                    name = f"{base}_{n}"
+                used.add(name)
+                zf.writestr(name + ".png", png)
+                yield sink.drain()
+        yield sink.drain()
+    finally:
+        for _, _, task in pending:
+            task.cancel()
+
+@router.post("/qr/vcard/batch")
+async def qr_vcard_batch(
+    request: Request,
+    os: str = Query("ios", pattern="^(ios|android)$", description="Профиль для строк без поля os"),
+    filename: str = Query("vcard_qr", description="Имя ZIP-архива"),
+):
+    """
+    Пакетная выгрузка фирменных QR: JSON-массив объектов или CSV с колонками
+    fn, org, title, dept, email, mobile, work_short, os (+ необязательный filename).
+    Ответ — ZIP, который отдаётся по мере рендера, файл за файлом.
+    """
+    rows = _parse_batch_rows(await request.body(), request.headers.get("content-type", ""))
+    if len(rows) > QR_BATCH_MAX_ROWS:
+        raise HTTPException(413, f"Не больше {QR_BATCH_MAX_ROWS} строк за раз")
+    rows = [_normalize_batch_row(i, r, os) for i, r in enumerate(rows)]
+    zip_name = _safe_ascii_filename(filename, "vcard_qr") + ".zip"
+    return StreamingResponse(_stream_batch_zip(rows), media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="{zip_name}"'})